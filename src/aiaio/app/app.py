@@ -1,24 +1,26 @@
 import asyncio
 import base64
+import codecs
+import collections
 import os
-import re
+import secrets
 import sqlite3
 import tempfile
 import time
-from contextvars import ContextVar
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
 
+import orjson
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
 
 from aiaio import __version__, logger
-from aiaio.db import ChatDatabase
+from aiaio.db import ChatDatabase, Message, WriteQueue
 from aiaio.prompts import SUMMARY_PROMPT
 
 
@@ -35,39 +37,107 @@ templates = Jinja2Templates(directory=templates_path)
 TEMP_DIR = Path(tempfile.gettempdir()) / "aiaio_uploads"
 TEMP_DIR.mkdir(exist_ok=True)
 
+# Opt-in address providers on this machine can fetch uploads from, instead of getting them as base64 data URLs.
+# Leave unset for local servers that only accept data URLs.
+SERVER_URL = os.environ.get("AIAIO_SERVER_URL")
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
 # Initialize database
 db = ChatDatabase()
+write_queue = WriteQueue(db)
+
+# Seconds a single websocket send may take before the peer is considered wedged
+SEND_TIMEOUT = 0.5
+
+# Websocket connection caps, overall and per client address
+MAX_WS_CONNECTIONS = int(os.environ.get("AIAIO_MAX_WS", "1000"))
+MAX_WS_PER_IP = int(os.environ.get("AIAIO_MAX_WS_PER_IP", "32"))
+_ws_per_ip = collections.Counter()
 
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}  # Use dict instead of list
-        self.active_generations: Dict[str, bool] = {}  # Track active generations
+        self.active_generations: Dict[str, asyncio.Event] = {}  # Stop signals of active generations
+        self.rooms: Dict[str, Set[str]] = {}  # conversation_id -> subscribed client_ids
+        self.client_rooms: Dict[str, str] = {}  # client_id -> conversation_id it's viewing
+        self._closing: Set[asyncio.Task] = set()  # Closes of swept connections still in flight
 
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
         self.active_connections[client_id] = websocket
-        self.active_generations[client_id] = False
 
-    def disconnect(self, client_id: str):
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        if websocket is not None and self.active_connections.get(client_id) is not websocket:
+            # A newer connection already took over this client_id
+            return
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         if client_id in self.active_generations:
             del self.active_generations[client_id]
+        self.unsubscribe(client_id)
+
+    def subscribe(self, client_id: str, conversation_id: str):
+        # A client views one conversation at a time
+        self.unsubscribe(client_id)
+        self.rooms.setdefault(conversation_id, set()).add(client_id)
+        self.client_rooms[client_id] = conversation_id
+
+    def unsubscribe(self, client_id: str):
+        conversation_id = self.client_rooms.pop(client_id, None)
+        if conversation_id is None:
+            return
+        room = self.rooms.get(conversation_id)
+        if room is not None:
+            room.discard(client_id)
+            if not room:
+                del self.rooms[conversation_id]
+
+    def set_generating(self, client_id: str, is_generating: bool) -> Optional[asyncio.Event]:
+        if is_generating:
+            # A fresh event per generation, set when the client asks to stop
+            stop_event = self.active_generations[client_id] = asyncio.Event()
+            return stop_event
+        stop_event = self.active_generations.pop(client_id, None)
+        if stop_event:
+            stop_event.set()
+        return None
+
+    def stop(self, client_id: str):
+        stop_event = self.active_generations.get(client_id)
+        if stop_event:
+            stop_event.set()
+
+    async def _close(self, connection: WebSocket):
+        try:
+            await asyncio.wait_for(connection.close(code=1011), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def _fan_out(self, client_ids, message: dict):
+        # Serialize once and fan out concurrently so one slow client doesn't stall the rest.
+        # The same text frame is shared by every peer, the frontend JSON.parses text frames.
+        frame = {"type": "websocket.send", "text": orjson.dumps(message).decode()}
+        items = [(cid, self.active_connections[cid]) for cid in client_ids if cid in self.active_connections]
+        results = await asyncio.gather(
+            *(asyncio.wait_for(connection.send(frame), SEND_TIMEOUT) for _, connection in items),
+            return_exceptions=True,
+        )
 
-    def set_generating(self, client_id: str, is_generating: bool):
-        self.active_generations[client_id] = is_generating
-
-    def should_stop(self, client_id: str) -> bool:
-        return not self.active_generations.get(client_id, False)
+        # Sweep dead or wedged peers once the fan-out is done instead of retrying them on every broadcast
+        for (client_id, connection), result in zip(items, results):
+            if isinstance(result, BaseException):
+                self.disconnect(client_id, connection)
+                task = asyncio.create_task(self._close(connection))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections.values():
-            try:
-                await connection.send_json(message)
-            except Exception:
-                # If sending fails, we'll handle it in the main websocket route
-                pass
+        await self._fan_out(list(self.active_connections), message)
+
+    async def broadcast_to_room(self, conversation_id: str, message: dict):
+        # Only clients currently viewing the conversation care about its message level events
+        await self._fan_out(list(self.rooms.get(conversation_id, ())), message)
 
 
 manager = ConnectionManager()
@@ -207,76 +277,269 @@ class MessageEdit(BaseModel):
     content: str
 
 
-@dataclass
-class RequestContext:
-    is_disconnected: bool = False
+# OpenAI clients keyed by (api_key, host) so their connection pools are reused across requests
+_CLIENT_CACHE: Dict[Tuple[str, str], AsyncOpenAI] = {}
+
+
+def _client_key(provider: Dict) -> Tuple[str, str]:
+    return (provider["api_key"] if provider["api_key"] != "" else "empty", provider["host"])
+
+
+def get_client(provider: Dict) -> AsyncOpenAI:
+    """
+    Get a cached async OpenAI client for a provider, creating it on first use.
+
+    Args:
+        provider (Dict): Provider row with `api_key` and `host`
+
+    Returns:
+        AsyncOpenAI: Client for the provider
+    """
+    key = _client_key(provider)
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        client = _CLIENT_CACHE[key] = AsyncOpenAI(api_key=key[0], base_url=key[1])
+    return client
+
+
+def drop_client(provider: Optional[Dict]):
+    """Forget the cached client of a provider whose settings changed or that was removed."""
+    if provider:
+        _CLIENT_CACHE.pop(_client_key(provider), None)
+
+
+# Seconds a cached value may be served before it's reloaded. Changes made through this process invalidate the
+# cache right away, the TTL bounds how long other `--workers` processes keep serving a stale value.
+CACHE_TTL = 30.0
+
+
+class CachedValue:
+    """
+    Value loaded from the database on first use and kept until `invalidate` is called or CACHE_TTL passes.
+
+    Args:
+        loader: Coroutine function producing the value
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._value = None
+        self._loaded_at = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < CACHE_TTL
+
+    async def get(self):
+        if self._fresh():
+            return self._value
+        async with self._lock:
+            if not self._fresh():
+                generation = self._generation
+                self._value = await self._loader()
+                # An invalidation that landed while loading leaves the value stale, so the next call reloads
+                self._loaded_at = time.monotonic() if generation == self._generation else None
+            return self._value
+
+    def invalidate(self):
+        self._generation += 1
+        self._loaded_at = None
+
+
+async def _load_defaults() -> Tuple[Optional[Dict], Optional[Dict]]:
+    provider = await asyncio.to_thread(db.get_default_provider)
+    model = await asyncio.to_thread(db.get_default_model, provider["id"]) if provider else None
+    return provider, model
+
+
+async def _load_active_prompt() -> Optional[Dict]:
+    prompt = await asyncio.to_thread(db.get_active_prompt)
+    if not prompt:
+        # If no active prompt, get default
+        prompt = await asyncio.to_thread(db.get_prompt_by_name, "default")
+        if prompt:
+            # Make default prompt active
+            await asyncio.to_thread(db.set_active_prompt, prompt["id"])
+    return prompt
+
+
+# Default provider and model, and the active system prompt, invalidated by the endpoints changing them
+_DEFAULTS = CachedValue(_load_defaults)
+_ACTIVE_PROMPT = CachedValue(_load_active_prompt)
+
+
+async def get_defaults() -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Get the default provider and its default model, served from a cache.
+
+    Returns:
+        Tuple[Optional[Dict], Optional[Dict]]: Default provider and default model
+    """
+    return await _DEFAULTS.get()
+
+
+def invalidate_defaults():
+    """Force the next `get_defaults` call to reload from the database."""
+    _DEFAULTS.invalidate()
+
+
+async def get_cached_active_prompt() -> Optional[Dict]:
+    """
+    Get the active system prompt, falling back to (and activating) the default one, served from a cache.
+
+    Returns:
+        Optional[Dict]: Active prompt data if found, None otherwise
+    """
+    return await _ACTIVE_PROMPT.get()
+
+
+def invalidate_active_prompt():
+    """Force the next `get_cached_active_prompt` call to reload from the database."""
+    _ACTIVE_PROMPT.invalidate()
+
+
+# Must be a multiple of 3 so no base64 padding appears mid-stream
+B64_CHUNK_SIZE = 48 * 1024
+
+# Top-level mime type -> content part type for attachments.
+# Anything else (PDF, etc) is sent as image_url with its proper MIME type,
+# many APIs support this for document understanding.
+_ATT_DISPATCH = {
+    "image": "image_url",
+    "video": "video_url",
+    "audio": "input_audio",
+}
+
+
+def _b64_file(file_path: str) -> str:
+    """
+    Base64 encode a file in fixed-size chunks to keep the working set bounded.
+
+    Args:
+        file_path (str): Path to the file to encode
+
+    Returns:
+        str: Base64 encoded file contents
+    """
+    buf = bytearray()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(B64_CHUNK_SIZE):
+            buf += base64.b64encode(chunk)
+    return buf.decode("ascii")
+
+
+def _is_utf8_file(file_path: str) -> bool:
+    """
+    Check whether a whole file decodes as UTF-8, which is what `chat` needs to inline it into the message.
+
+    Args:
+        file_path (str): Path to the file to check
+
+    Returns:
+        bool: True if the file is valid UTF-8
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(file_path, "rb") as f:
+            while chunk := f.read(B64_CHUNK_SIZE):
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def encode_attachment(att: Dict, uploads_url: Optional[str] = None) -> Optional[Dict]:
+    """
+    Build the content part for a single attachment.
+
+    Args:
+        att (Dict): Attachment metadata row
+        uploads_url (str, optional): Base URL uploads are served from. When set, uploaded files are
+            passed by reference instead of being base64 encoded.
+
+    Returns:
+        Optional[Dict]: Content part in the OpenAI chat format, None if the attachment is skipped
+    """
+    file_type = att.get("file_type", "").split("/")[0]
+    file_path = att["file_path"]
+    mime_type = att.get("file_type", "application/octet-stream")
+
+    if file_type not in _ATT_DISPATCH and (mime_type or "").startswith("text/") and _is_utf8_file(file_path):
+        # Text files are already inlined into the message by `chat`, the ones that don't decode are sent as files
+        return None
+
+    if uploads_url and Path(file_path).parent == TEMP_DIR:
+        # The provider can fetch the file from us, skip the base64 round trip
+        url = f"{uploads_url}/{Path(file_path).name}"
+    else:
+        # For all other file types, encode as base64 and let the API handle it
+        url = f"data:{mime_type};base64,{_b64_file(file_path)}"
+
+    kind = _ATT_DISPATCH.get(file_type, "image_url")
+    return {"type": kind, kind: {"url": url}}
+
+
+async def build_content(text: str, attachments: List[Dict], uploads_url: Optional[str] = None) -> List[Dict]:
+    """
+    Build the multimodal content list for a message with attachments.
 
+    Attachments are encoded concurrently in worker threads, file reads and encoding block.
 
-# Create a context variable to track request state
-request_context: ContextVar[RequestContext] = ContextVar("request_context", default=RequestContext())
+    Args:
+        text (str): Text content of the message
+        attachments (List[Dict]): Attachment metadata rows for the message
+        uploads_url (str, optional): Base URL uploads are served from
 
+    Returns:
+        List[Dict]: Content parts in the OpenAI chat format
+    """
+    content = []
+    if text:
+        content.append({"type": "text", "text": text})
 
-async def text_streamer(messages: List[Dict[str, str]], client_id: str):
+    parts = await asyncio.gather(*(asyncio.to_thread(encode_attachment, att, uploads_url) for att in attachments))
+    content.extend(part for part in parts if part is not None)
+    return content
+
+
+async def text_streamer(messages: List[Message], client_id: str):
     """Stream text responses from the AI model."""
     # Get default provider and model
-    provider = db.get_default_provider()
+    provider, default_model = await get_defaults()
     if not provider:
         raise HTTPException(status_code=404, detail="No default provider found")
 
-    default_model = db.get_default_model(provider["id"])
     if not default_model:
         raise HTTPException(status_code=404, detail="No default model found for provider")
 
-    client = OpenAI(
-        api_key=provider["api_key"] if provider["api_key"] != "" else "empty",
-        base_url=provider["host"],
-    )
+    client = get_client(provider)
+
+    # Providers running on this machine can read uploads by URL when AIAIO_SERVER_URL is set
+    uploads_url = None
+    if SERVER_URL and urlparse(provider["host"]).hostname in LOCAL_HOSTS:
+        uploads_url = f"{SERVER_URL.rstrip('/')}/uploads"
 
     formatted_messages = []
 
     for msg in messages:
-        formatted_msg = {"role": msg["role"]}
-        attachments = msg.get("attachments", [])
+        formatted_msg = {"role": msg.role}
+        attachments = msg.attachments
 
         if attachments:
             # Handle messages with attachments
-            content = []
-            if msg["content"]:
-                content.append({"type": "text", "text": msg["content"]})
-
-            for att in attachments:
-                file_type = att.get("file_type", "").split("/")[0]
-                file_path = att["file_path"]
-                mime_type = att.get("file_type", "application/octet-stream")
-
-                # For all file types, encode as base64 and let the API handle it
-                with open(file_path, "rb") as f:
-                    file_data = base64.b64encode(f.read()).decode()
-
-                # Handle different file types
-                if file_type == "image":
-                    content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{file_data}"}})
-                elif file_type == "video":
-                    content.append({"type": "video_url", "video_url": {"url": f"data:{mime_type};base64,{file_data}"}})
-                elif file_type == "audio":
-                    content.append(
-                        {"type": "input_audio", "input_audio": {"url": f"data:{mime_type};base64,{file_data}"}}
-                    )
-                else:
-                    # For documents (PDF, etc), send as image_url with proper MIME type
-                    # Many APIs support this for document understanding
-                    content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{file_data}"}})
-
-            formatted_msg["content"] = content
+            formatted_msg["content"] = await build_content(msg.content, attachments, uploads_url)
         else:
             # Handle text-only messages
-            formatted_msg["content"] = msg["content"]
+            formatted_msg["content"] = msg.content
 
         formatted_messages.append(formatted_msg)
 
     stream = None
+    watchdog = None
+    stop_event = manager.set_generating(client_id, True)
     try:
-        manager.set_generating(client_id, True)
 
         # Prepare API call parameters
         api_params = {
@@ -291,10 +554,12 @@ async def text_streamer(messages: List[Dict[str, str]], client_id: str):
         if provider.get("reasoning_effort") and provider["reasoning_effort"] != "none":
             api_params["reasoning_effort"] = provider["reasoning_effort"]
 
-        stream = client.chat.completions.create(**api_params)
+        stream = await client.chat.completions.create(**api_params)
+        # Close the stream as soon as a stop is requested instead of waiting for the next token
+        watchdog = asyncio.create_task(_close_on_stop(stop_event, stream))
 
-        for message in stream:
-            if manager.should_stop(client_id):
+        async for message in stream:
+            if stop_event.is_set():
                 logger.info(f"Stopping generation for client {client_id}")
                 break
 
@@ -304,6 +569,10 @@ async def text_streamer(messages: List[Dict[str, str]], client_id: str):
                     yield message.choices[0].delta.content
 
     except Exception as e:
+        if stop_event.is_set():
+            # The watchdog closed the stream underneath us
+            logger.info(f"Stopping generation for client {client_id}")
+            return
         logger.error(f"Error in text_streamer: {e}")
         # Yield error message with special marker so frontend can display it
         error_message = f"__ERROR__:{str(e)}"
@@ -311,9 +580,60 @@ async def text_streamer(messages: List[Dict[str, str]], client_id: str):
         raise
 
     finally:
-        manager.set_generating(client_id, False)
+        if watchdog:
+            watchdog.cancel()
+        if manager.active_generations.get(client_id) is stop_event:
+            manager.set_generating(client_id, False)
         if stream and hasattr(stream, "response"):
-            stream.response.close()
+            await stream.response.aclose()
+
+
+async def _close_on_stop(stop_event: asyncio.Event, stream):
+    """Close a completion stream once its generation is asked to stop."""
+    await stop_event.wait()
+    if hasattr(stream, "response"):
+        await stream.response.aclose()
+
+
+# Streamed chunks are coalesced until this many characters are buffered or this many seconds passed
+STREAM_FLUSH_SIZE = int(os.environ.get("AIAIO_STREAM_FLUSH_SIZE", "256"))
+STREAM_FLUSH_INTERVAL = float(os.environ.get("AIAIO_STREAM_FLUSH_INTERVAL", "0.025"))
+
+
+async def coalesce_chunks(chunks):
+    """
+    Merge small streamed chunks so each write to the client carries more than a single token.
+
+    Args:
+        chunks: Async iterator of text chunks
+
+    Yields:
+        str: Merged chunks
+    """
+    buf = []
+    size = 0
+    last = time.monotonic()
+    try:
+        async for chunk in chunks:
+            buf.append(chunk)
+            size += len(chunk)
+            now = time.monotonic()
+            if size >= STREAM_FLUSH_SIZE or now - last >= STREAM_FLUSH_INTERVAL:
+                yield "".join(buf)
+                buf.clear()
+                size = 0
+                last = now
+    except Exception:
+        # Send what was already buffered before failing, text_streamer's __ERROR__ marker included
+        if buf:
+            yield "".join(buf)
+        raise
+    if buf:
+        yield "".join(buf)
+
+
+# Rendered index page and when it was rendered
+_INDEX_CACHE = {"ts": 0.0, "body": b""}
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -325,15 +645,18 @@ async def load_index(request: Request):
         request (Request): FastAPI request object
 
     Returns:
-        TemplateResponse: Rendered HTML template
-    """
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
-        },
-    )
+        HTMLResponse: Rendered HTML template
+    """
+    # The page only changes with the timestamp, so share one render per second across requests
+    now = time.time()
+    if now - _INDEX_CACHE["ts"] > 1.0:
+        _INDEX_CACHE["body"] = (
+            templates.get_template("index.html")
+            .render(request=request, time=time.strftime("%Y-%m-%d %H:%M:%S"))
+            .encode()
+        )
+        _INDEX_CACHE["ts"] = now
+    return HTMLResponse(_INDEX_CACHE["body"])
 
 
 @app.get("/version")
@@ -362,8 +685,9 @@ async def get_conversations(project_id: Optional[str] = None):
         HTTPException: If database operation fails
     """
     try:
-        conversations = db.get_all_conversations(project_id)
-        return {"conversations": conversations}
+        conversations = await asyncio.to_thread(db.get_all_conversations, project_id)
+        # orjson handles the rows directly, skip FastAPI's jsonable_encoder pass
+        return Response(orjson.dumps({"conversations": conversations}), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -383,10 +707,11 @@ async def get_conversation(conversation_id: str):
         HTTPException: If conversation not found or operation fails
     """
     try:
-        history = db.get_conversation_history(conversation_id)
+        history = await asyncio.to_thread(db.get_conversation_history, conversation_id)
         if not history:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        return {"messages": history}
+        # orjson serializes the Message dataclasses natively, skip FastAPI's jsonable_encoder pass
+        return Response(orjson.dumps({"messages": history}), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -408,7 +733,7 @@ async def create_conversation(input: Optional[CreateConversationInput] = None):
     """
     try:
         project_id = input.project_id if input else None
-        conversation_id = db.create_conversation(project_id)
+        conversation_id = await asyncio.to_thread(db.create_conversation, project_id)
         await manager.broadcast({"type": "conversation_created", "conversation_id": conversation_id})
         return {"conversation_id": conversation_id}
     except Exception as e:
@@ -431,7 +756,8 @@ async def add_message(conversation_id: str, message: MessageInput):
         HTTPException: If operation fails
     """
     try:
-        message_id = db.add_message(
+        message_id = await write_queue.submit(
+            "add_message",
             conversation_id=conversation_id,
             role=message.role,
             content=message.content,
@@ -459,18 +785,20 @@ async def edit_message(message_id: str, edit: MessageEdit):
         HTTPException: If message not found or edit not allowed
     """
     try:
-        success = db.edit_message(message_id, edit.content)
+        success, role, conversation_id = await asyncio.to_thread(db.edit_message, message_id, edit.content)
         if not success:
             raise HTTPException(status_code=404, detail="Message not found")
 
-        # Get message role to send in broadcast
-        with sqlite3.connect(db.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            msg = conn.execute("SELECT role FROM messages WHERE message_id = ?", (message_id,)).fetchone()
-
-        # Broadcast update to all connected clients
-        await manager.broadcast(
-            {"type": "message_edited", "message_id": message_id, "content": edit.content, "role": msg["role"]}
+        # Broadcast update to the clients viewing the conversation
+        await manager.broadcast_to_room(
+            conversation_id,
+            {
+                "type": "message_edited",
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "content": edit.content,
+                "role": role,
+            },
         )
 
         return {"status": "success"}
@@ -494,14 +822,11 @@ async def get_raw_message(message_id: str):
         HTTPException: If message not found
     """
     try:
-        with sqlite3.connect(db.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            message = conn.execute("SELECT content FROM messages WHERE message_id = ?", (message_id,)).fetchone()
-
-            if not message:
-                raise HTTPException(status_code=404, detail="Message not found")
+        content = await asyncio.to_thread(db.get_message_content, message_id)
+        if content is None:
+            raise HTTPException(status_code=404, detail="Message not found")
 
-            return {"content": message["content"]}
+        return {"content": content}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -521,7 +846,7 @@ async def delete_conversation(conversation_id: str):
         HTTPException: If deletion fails
     """
     try:
-        db.delete_conversation(conversation_id)
+        await asyncio.to_thread(db.delete_conversation, conversation_id)
         await manager.broadcast({"type": "conversation_deleted", "conversation_id": conversation_id})
         return {"status": "success"}
     except Exception as e:
@@ -550,7 +875,7 @@ async def update_conversation_title(conversation_id: str, update: ConversationTi
         HTTPException: If update fails
     """
     try:
-        db.update_conversation_summary(conversation_id, update.title)
+        await asyncio.to_thread(db.update_conversation_summary, conversation_id, update.title)
         await manager.broadcast(
             {"type": "summary_updated", "conversation_id": conversation_id, "summary": update.title}
         )
@@ -564,7 +889,7 @@ async def update_conversation_title(conversation_id: str, update: ConversationTi
 async def get_all_providers():
     """Get all providers."""
     try:
-        providers = db.get_all_providers()
+        providers = await asyncio.to_thread(db.get_all_providers)
         return {"providers": providers}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -574,7 +899,7 @@ async def get_all_providers():
 async def get_provider(provider_id: int):
     """Get provider by ID."""
     try:
-        provider = db.get_provider_by_id(provider_id)
+        provider = await asyncio.to_thread(db.get_provider_by_id, provider_id)
         if not provider:
             raise HTTPException(status_code=404, detail="Provider not found")
         return provider
@@ -587,7 +912,7 @@ async def create_provider(provider: ProviderInput):
     """Create a new provider."""
     try:
         provider_dict = provider.model_dump()
-        provider_id = db.add_provider(provider_dict)
+        provider_id = await asyncio.to_thread(db.add_provider, provider_dict)
         return {"status": "success", "id": provider_id}
     except sqlite3.IntegrityError as e:
         if "unique" in str(e).lower():
@@ -602,9 +927,12 @@ async def update_provider(provider_id: int, provider: ProviderInput):
     """Update a provider."""
     try:
         provider_dict = provider.model_dump()
-        success = db.update_provider(provider_id, provider_dict)
+        old_provider = await asyncio.to_thread(db.get_provider_by_id, provider_id)
+        success = await asyncio.to_thread(db.update_provider, provider_id, provider_dict)
         if not success:
             raise HTTPException(status_code=404, detail="Provider not found")
+        drop_client(old_provider)
+        invalidate_defaults()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -614,9 +942,12 @@ async def update_provider(provider_id: int, provider: ProviderInput):
 async def delete_provider(provider_id: int):
     """Delete a provider."""
     try:
-        success = db.delete_provider(provider_id)
+        old_provider = await asyncio.to_thread(db.get_provider_by_id, provider_id)
+        success = await asyncio.to_thread(db.delete_provider, provider_id)
         if not success:
             raise HTTPException(status_code=404, detail="Provider not found")
+        drop_client(old_provider)
+        invalidate_defaults()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -626,9 +957,10 @@ async def delete_provider(provider_id: int):
 async def set_default_provider(provider_id: int):
     """Set a provider as default."""
     try:
-        success = db.set_default_provider(provider_id)
+        success = await asyncio.to_thread(db.set_default_provider, provider_id)
         if not success:
             raise HTTPException(status_code=404, detail="Provider not found")
+        invalidate_defaults()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -639,7 +971,7 @@ async def set_default_provider(provider_id: int):
 async def get_provider_models(provider_id: int):
     """Get all models for a provider."""
     try:
-        models = db.get_models_by_provider(provider_id)
+        models = await asyncio.to_thread(db.get_models_by_provider, provider_id)
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -649,7 +981,10 @@ async def get_provider_models(provider_id: int):
 async def add_provider_model(provider_id: int, model: ModelInput):
     """Add a model to a provider."""
     try:
-        model_id = db.add_model(provider_id, model.model_name, is_multimodal=model.is_multimodal)
+        model_id = await asyncio.to_thread(
+            db.add_model, provider_id, model.model_name, is_multimodal=model.is_multimodal
+        )
+        invalidate_defaults()
         return {"status": "success", "id": model_id}
     except sqlite3.IntegrityError as e:
         if "unique" in str(e).lower():
@@ -663,9 +998,10 @@ async def add_provider_model(provider_id: int, model: ModelInput):
 async def delete_model(model_id: int):
     """Delete a model."""
     try:
-        success = db.delete_model(model_id)
+        success = await asyncio.to_thread(db.delete_model, model_id)
         if not success:
             raise HTTPException(status_code=404, detail="Model not found")
+        invalidate_defaults()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -675,9 +1011,10 @@ async def delete_model(model_id: int):
 async def set_default_model(model_id: int):
     """Set a model as default for its provider."""
     try:
-        success = db.set_default_model(model_id)
+        success = await asyncio.to_thread(db.set_default_model, model_id)
         if not success:
             raise HTTPException(status_code=404, detail="Model not found")
+        invalidate_defaults()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -687,7 +1024,7 @@ async def set_default_model(model_id: int):
 async def get_default_provider():
     """Get the default provider."""
     try:
-        provider = db.get_default_provider()
+        provider, _ = await get_defaults()
         if not provider:
             raise HTTPException(status_code=404, detail="No default provider found")
         return provider
@@ -700,7 +1037,7 @@ async def get_default_provider():
 async def get_projects():
     """Get all projects."""
     try:
-        projects = db.get_projects()
+        projects = await asyncio.to_thread(db.get_projects)
         return {"projects": projects}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -710,7 +1047,7 @@ async def get_projects():
 async def get_project(project_id: str):
     """Get project by ID."""
     try:
-        project = db.get_project(project_id)
+        project = await asyncio.to_thread(db.get_project, project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         return project
@@ -722,8 +1059,8 @@ async def get_project(project_id: str):
 async def create_project(project: ProjectInput):
     """Create a new project."""
     try:
-        project_id = db.create_project(
-            name=project.name, description=project.description, system_prompt=project.system_prompt
+        project_id = await asyncio.to_thread(
+            db.create_project, name=project.name, description=project.description, system_prompt=project.system_prompt
         )
         return {"status": "success", "id": project_id}
     except Exception as e:
@@ -734,7 +1071,8 @@ async def create_project(project: ProjectInput):
 async def update_project(project_id: str, project: ProjectInput):
     """Update a project."""
     try:
-        success = db.update_project(
+        success = await asyncio.to_thread(
+            db.update_project,
             project_id=project_id,
             name=project.name,
             description=project.description,
@@ -751,7 +1089,7 @@ async def update_project(project_id: str, project: ProjectInput):
 async def delete_project(project_id: str):
     """Delete a project."""
     try:
-        success = db.delete_project(project_id)
+        success = await asyncio.to_thread(db.delete_project, project_id)
         if not success:
             raise HTTPException(status_code=404, detail="Project not found")
         return {"status": "success"}
@@ -759,29 +1097,76 @@ async def delete_project(project_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Number of leading bytes inspected to decide whether an upload is text
+TEXT_SNIFF_SIZE = 4096
+
+# Size of the chunks uploads are copied to disk with
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def is_probably_text(head: bytes) -> bool:
+    """
+    Check whether the leading bytes of a file decode as UTF-8.
+
+    Args:
+        head (bytes): First bytes of the file
+
+    Returns:
+        bool: True if the bytes are valid (possibly truncated) UTF-8
+    """
+    try:
+        # Incremental decoding tolerates a multi-byte character cut off at the end of `head`
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
 def generate_safe_filename(original_filename: str) -> str:
     """
-    Generate a safe filename with timestamp to prevent collisions.
+    Generate a random, collision-free filename that keeps the original extension.
 
     Args:
-        original_filename (str): Original filename to be sanitized
+        original_filename (str): Original filename of the upload
 
     Returns:
-        str: Sanitized filename with timestamp
+        str: Random hex filename with the original extension
     """
-    # Get timestamp
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    return f"{secrets.token_hex(8)}{Path(original_filename).suffix}"
 
-    # Get file extension
-    ext = Path(original_filename).suffix
 
-    # Get base name and sanitize it
-    base = Path(original_filename).stem
-    # Remove special characters and spaces
-    base = re.sub(r"[^\w\-_]", "_", base)
+def history_entry(
+    conversation_id: str, message_id: str, role: str, content: str, attachments: Optional[List[Dict]] = None
+) -> Message:
+    """
+    Build a conversation history entry matching what `db.get_conversation_history` returns.
+
+    Args:
+        conversation_id (str): ID of the conversation
+        message_id (str): ID of the stored message
+        role (str): Role of the message sender
+        content (str): Message content
+        attachments (List[Dict], optional): Uploaded file info as passed to `add_message`
 
-    # Create new filename
-    return f"{base}_{timestamp}{ext}"
+    Returns:
+        Message: History entry
+    """
+    return Message(
+        role=role,
+        content=content,
+        message_id=message_id,
+        conversation_id=conversation_id,
+        created_at=time.time(),
+        attachments=[
+            {
+                "file_name": att["name"],
+                "file_path": att["path"],
+                "file_type": att["type"],
+                "file_size": att["size"],
+            }
+            for att in attachments or []
+        ],
+    )
 
 
 @app.get("/get_system_prompt", response_class=JSONResponse)
@@ -800,27 +1185,80 @@ async def get_system_prompt(conversation_id: str = None):
     """
     try:
         if conversation_id:
-            history = db.get_conversation_history(conversation_id)
+            history = await asyncio.to_thread(db.get_conversation_history, conversation_id)
             if history:
-                system_role_messages = [m for m in history if m["role"] == "system"]
+                system_role_messages = [m for m in history if m.role == "system"]
                 last_system_message = (
-                    system_role_messages[-1]["content"] if system_role_messages else "You are a helpful assistant."
+                    system_role_messages[-1].content if system_role_messages else "You are a helpful assistant."
                 )
                 return {"system_prompt": last_system_message}
 
         # Default system prompt for new conversations or when no conversation_id is provided
         # If conversation_id is provided, check its project
         if conversation_id:
-            project = db.get_project_for_conversation(conversation_id)
+            project = await asyncio.to_thread(db.get_project_for_conversation, conversation_id)
             if project and project.get("system_prompt"):
                 return {"system_prompt": project["system_prompt"]}
 
-        active_prompt = db.get_active_prompt()
+        active_prompt = await get_cached_active_prompt()
         return {"system_prompt": active_prompt["prompt_text"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Keep references to fire-and-forget tasks so they aren't garbage collected mid-flight
+_BACKGROUND_TASKS = set()
+
+
+async def generate_summary(conversation_id: str, history: List[Message], client_id: str):
+    """
+    Generate, store and broadcast the summary of a conversation.
+
+    Args:
+        conversation_id (str): ID of the conversation
+        history (List[Message]): Conversation history, the user message is expected at index 1
+        client_id (str): ID of the client the conversation belongs to
+    """
+    try:
+        # Get the default provider to check use_for_summarization setting
+        provider, _ = await get_defaults()
+
+        if provider and provider.get("use_for_summarization", False):
+            # Use model to generate summary
+            all_user_messages = [m.content for m in history if m.role == "user"]
+            summary_messages = [
+                Message(role="system", content=SUMMARY_PROMPT),
+                Message(role="user", content=str(all_user_messages)),
+            ]
+            summary_parts = []
+            logger.info(summary_messages)
+            async for chunk in text_streamer(summary_messages, client_id):
+                summary_parts.append(chunk)
+            summary = "".join(summary_parts)
+            await write_queue.submit(
+                "update_conversation_summary", conversation_id=conversation_id, summary=summary.strip()
+            )
+        else:
+            # Use first few words of user message as summary
+            user_message = history[1].content
+            # Get first 50 characters or until first newline
+            summary = user_message.split("\n")[0][:50]
+            if len(user_message.split("\n")[0]) > 50:
+                summary += "..."
+            await write_queue.submit("update_conversation_summary", conversation_id=conversation_id, summary=summary)
+
+        # After summary update
+        await manager.broadcast(
+            {
+                "type": "summary_updated",
+                "conversation_id": conversation_id,
+                "summary": summary if isinstance(summary, str) else summary.strip(),
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to generate summary: {e}")
+
+
 @app.post("/chat", response_class=StreamingResponse)
 async def chat(
     message: str = Form(...),
@@ -848,51 +1286,55 @@ async def chat(
     try:
         logger.info(f"Chat request: message='{message}' conv_id={conversation_id} system_prompt='{system_prompt}'")
 
-        # Create new context for this request
-        ctx = RequestContext()
-        token = request_context.set(ctx)
+        # Verify conversation exists
+        history = await asyncio.to_thread(db.get_conversation_history, conversation_id)
+        if history:
+            system_role_messages = [m for m in history if m.role == "system"]
+            last_system_message = system_role_messages[-1].content if system_role_messages else ""
+            if last_system_message != system_prompt:
+                message_id = await write_queue.submit(
+                    "add_message",
+                    conversation_id=conversation_id,
+                    role="system",
+                    content=system_prompt,
+                )
+                history.append(history_entry(conversation_id, message_id, "system", system_prompt))
 
-        try:
-            # Verify conversation exists
-            history = db.get_conversation_history(conversation_id)
-            if history:
-                system_role_messages = [m for m in history if m["role"] == "system"]
-                last_system_message = system_role_messages[-1]["content"] if system_role_messages else ""
-                if last_system_message != system_prompt:
-                    db.add_message(conversation_id=conversation_id, role="system", content=system_prompt)
-
-            # Handle multiple file uploads
-            file_info_list = []
-            if files:
-                for file in files:
-                    if file is None:
-                        continue
-
-                    # Get file size by reading the file into memory
-                    contents = await file.read()
-                    file_size = len(contents)
-
-                    # Generate safe unique filename
-                    safe_filename = generate_safe_filename(file.filename)
-                    temp_file = TEMP_DIR / safe_filename
+        # Handle multiple file uploads
+        file_info_list = []
+        if files:
+            for file in files:
+                if file is None:
+                    continue
 
-                    try:
-                        # Save uploaded file
-                        with open(temp_file, "wb") as f:
-                            f.write(contents)
-                        file_info = {
-                            "name": file.filename,  # Original name for display
-                            "path": str(temp_file),  # Path to saved file
-                            "type": file.content_type,
-                            "size": file_size,
-                        }
-                        file_info_list.append(file_info)
-                        logger.info(f"Saved uploaded file: {temp_file} ({file_size} bytes)")
-                    except Exception as e:
-                        logger.error(f"Failed to save uploaded file: {e}")
-                        raise HTTPException(status_code=500, detail=f"Failed to process uploaded file: {str(e)}")
+                # Generate safe unique filename
+                safe_filename = generate_safe_filename(file.filename)
+                temp_file = TEMP_DIR / safe_filename
 
-                    # Try to read file content if it's text
+                file_size = 0
+                head = b""
+                try:
+                    # Stream the upload to disk in bounded chunks, keeping only the head for sniffing
+                    with open(temp_file, "wb") as f:
+                        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                            if len(head) < TEXT_SNIFF_SIZE:
+                                head += chunk[: TEXT_SNIFF_SIZE - len(head)]
+                            f.write(chunk)
+                            file_size += len(chunk)
+                    file_info = {
+                        "name": file.filename,  # Original name for display
+                        "path": str(temp_file),  # Path to saved file
+                        "type": file.content_type,
+                        "size": file_size,
+                    }
+                    file_info_list.append(file_info)
+                    logger.info(f"Saved uploaded file: {temp_file} ({file_size} bytes)")
+                except Exception as e:
+                    logger.error(f"Failed to save uploaded file: {e}")
+                    raise HTTPException(status_code=500, detail=f"Failed to process uploaded file: {str(e)}")
+
+                # Append content of text files, only re-reading uploads that look like text
+                if (file.content_type or "").startswith("text/") or is_probably_text(head):
                     try:
                         with open(temp_file, "r", encoding="utf-8") as f:
                             text_content = f.read()
@@ -904,120 +1346,95 @@ async def chat(
                     except Exception as e:
                         logger.warning(f"Failed to read file content: {e}")
 
-            if not history:
-                db.add_message(conversation_id=conversation_id, role="system", content=system_prompt)
-
-            db.add_message(
+        if not history:
+            message_id = await write_queue.submit(
+                "add_message",
                 conversation_id=conversation_id,
-                role="user",
-                content=message,
-                attachments=file_info_list if file_info_list else None,
+                role="system",
+                content=system_prompt,
             )
+            history.append(history_entry(conversation_id, message_id, "system", system_prompt))
 
-            # get updated conversation history
-            history = db.get_conversation_history(conversation_id)
+        message_id = await write_queue.submit(
+            "add_message",
+            conversation_id=conversation_id,
+            role="user",
+            content=message,
+            attachments=file_info_list if file_info_list else None,
+        )
 
-            async def process_and_stream():
-                """
-                Inner generator function to process the chat and stream responses.
+        # Keep the in-memory history in sync instead of fetching it again
+        history.append(history_entry(conversation_id, message_id, "user", message, file_info_list))
 
-                Yields:
-                    str: Chunks of the AI response
-                """
-                full_response = ""
+        async def process_and_stream():
+            """
+            Inner generator function to process the chat and stream responses.
 
-                # Removed canned response generator
+            Yields:
+                str: Chunks of the AI response
+            """
+            parts = []
 
-                try:
-                    async for chunk in text_streamer(history, client_id):
-                        if ctx.is_disconnected:
-                            logger.info("Client disconnected, stopping generation")
-                            # Don't save partial response on user-initiated stop
-                            return
-                        full_response += chunk
-                        yield chunk
-                        await asyncio.sleep(0)  # Ensure chunks are flushed immediately
-                except asyncio.CancelledError:
-                    # Request was cancelled, save what we have so far
-                    logger.info("Request cancelled by client, saving partial response")
-                    if full_response:
-                        db.add_message(conversation_id=conversation_id, role="assistant", content=full_response)
-                    raise
-                except Exception as e:
-                    logger.error(f"Error in process_and_stream: {e}")
-                    raise
-
-                # Only store complete response if not cancelled
-                message_id = db.add_message(conversation_id=conversation_id, role="assistant", content=full_response)
-
-                # Broadcast update after storing the response
-                await manager.broadcast(
-                    {
-                        "type": "message_added",
-                        "conversation_id": conversation_id,
-                        "message_id": message_id,
-                    }
-                )
+            # Removed canned response generator
 
-                # Generate and store summary after assistant's response but only if its the first user message
-                if len(history) == 2 and history[1]["role"] == "user":
-                    try:
-                        # Get the default provider to check use_for_summarization setting
-                        provider = db.get_default_provider()
-
-                        if provider and provider.get("use_for_summarization", False):
-                            # Use model to generate summary
-                            all_user_messages = [m["content"] for m in history if m["role"] == "user"]
-                            summary_messages = [
-                                {"role": "system", "content": SUMMARY_PROMPT},
-                                {"role": "user", "content": str(all_user_messages)},
-                            ]
-                            summary = ""
-                            logger.info(summary_messages)
-                            async for chunk in text_streamer(summary_messages, client_id):
-                                summary += chunk
-                            db.update_conversation_summary(conversation_id, summary.strip())
-                        else:
-                            # Use first few words of user message as summary
-                            user_message = history[1]["content"]
-                            # Get first 50 characters or until first newline
-                            summary = user_message.split("\n")[0][:50]
-                            if len(user_message.split("\n")[0]) > 50:
-                                summary += "..."
-                            db.update_conversation_summary(conversation_id, summary)
-
-                        # After summary update
-                        await manager.broadcast(
-                            {
-                                "type": "summary_updated",
-                                "conversation_id": conversation_id,
-                                "summary": summary if isinstance(summary, str) else summary.strip(),
-                            }
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to generate summary: {e}")
-
-            response = StreamingResponse(
-                process_and_stream(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no",  # Disable Nginx buffering
-                },
+            try:
+                async for chunk in coalesce_chunks(text_streamer(history, client_id)):
+                    if await request.is_disconnected():
+                        logger.info("Client disconnected, stopping generation")
+                        # Don't save partial response on user-initiated stop
+                        return
+                    parts.append(chunk)
+                    yield chunk
+            except asyncio.CancelledError:
+                # Request was cancelled, save what we have so far
+                logger.info("Request cancelled by client, saving partial response")
+                if parts:
+                    await write_queue.submit(
+                        "add_message",
+                        conversation_id=conversation_id,
+                        role="assistant",
+                        content="".join(parts),
+                    )
+                raise
+            except Exception as e:
+                logger.error(f"Error in process_and_stream: {e}")
+                raise
+
+            # Only store complete response if not cancelled
+            message_id = await write_queue.submit(
+                "add_message",
+                conversation_id=conversation_id,
+                role="assistant",
+                content="".join(parts),
             )
 
-            # Set up disconnection detection using response closure
-            async def on_disconnect():
-                logger.info("Client disconnected, setting disconnected flag")
-                ctx.is_disconnected = True
+            # Broadcast update after storing the response
+            await manager.broadcast(
+                {
+                    "type": "message_added",
+                    "conversation_id": conversation_id,
+                    "message_id": message_id,
+                }
+            )
 
-            response.background = on_disconnect
-            return response
+            # Generate and store summary after assistant's response but only if its the first user message.
+            # Runs in the background so the response stream can close right away.
+            if len(history) == 2 and history[1].role == "user":
+                task = asyncio.create_task(generate_summary(conversation_id, list(history), client_id))
+                _BACKGROUND_TASKS.add(task)
+                task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+        response = StreamingResponse(
+            process_and_stream(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",  # Disable Nginx buffering
+            },
+        )
 
-        finally:
-            # Reset context when done
-            request_context.reset(token)
+        return response
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
@@ -1053,17 +1470,22 @@ async def chat_again(
         )
 
         # Verify conversation exists
-        history = db.get_conversation_history_upto_message_id(conversation_id, message_id)
+        history = await asyncio.to_thread(db.get_conversation_history_upto_message_id, conversation_id, message_id)
         logger.info(history)
 
         if not history:
             logger.error("No conversation history found")
             raise HTTPException(status_code=404, detail="No conversation history found")
 
-        system_role_messages = [m for m in history if m["role"] == "system"]
-        last_system_message = system_role_messages[-1]["content"] if system_role_messages else ""
+        system_role_messages = [m for m in history if m.role == "system"]
+        last_system_message = system_role_messages[-1].content if system_role_messages else ""
         if last_system_message != system_prompt:
-            db.add_message(conversation_id=conversation_id, role="system", content=system_prompt)
+            await write_queue.submit(
+                "add_message",
+                conversation_id=conversation_id,
+                role="system",
+                content=system_prompt,
+            )
 
         async def process_and_stream():
             """
@@ -1072,14 +1494,13 @@ async def chat_again(
             Yields:
                 str: Chunks of the AI response
             """
-            full_response = ""
-            async for chunk in text_streamer(history, client_id):
-                full_response += chunk
+            parts = []
+            async for chunk in coalesce_chunks(text_streamer(history, client_id)):
+                parts.append(chunk)
                 yield chunk
-                await asyncio.sleep(0)  # Ensure chunks are flushed immediately
 
             # Store the complete response
-            db.edit_message(message_id, full_response)
+            await write_queue.submit("edit_message", message_id=message_id, new_content="".join(parts))
 
             # Broadcast update after storing the response
             await manager.broadcast(
@@ -1120,7 +1541,7 @@ async def update_conversation_summary(conversation_id: str, summary: str = Form(
         HTTPException: If update fails
     """
     try:
-        db.update_conversation_summary(conversation_id, summary)
+        await asyncio.to_thread(db.update_conversation_summary, conversation_id, summary)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1130,7 +1551,7 @@ async def update_conversation_summary(conversation_id: str, summary: str = Form(
 async def get_all_prompts():
     """Get all system prompts."""
     try:
-        prompts = db.get_all_prompts()
+        prompts = await asyncio.to_thread(db.get_all_prompts)
         formatted_prompts = []
         for prompt in prompts:
             formatted_prompts.append(
@@ -1151,7 +1572,7 @@ async def get_all_prompts():
 async def get_prompt(prompt_id: int):
     """Get a specific prompt."""
     try:
-        prompt = db.get_prompt_by_id(prompt_id)
+        prompt = await asyncio.to_thread(db.get_prompt_by_id, prompt_id)
         if not prompt:
             raise HTTPException(status_code=404, detail="Prompt not found")
         return {
@@ -1168,8 +1589,11 @@ async def get_prompt(prompt_id: int):
 async def create_prompt(prompt: PromptInput):
     """Create a new prompt."""
     try:
-        prompt_id = db.add_system_prompt(prompt.name, prompt.text)
+        prompt_id = await asyncio.to_thread(db.add_system_prompt, prompt.name, prompt.text)
+        invalidate_active_prompt()
         return {"id": prompt_id}
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="A prompt with this name already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1178,10 +1602,13 @@ async def create_prompt(prompt: PromptInput):
 async def update_prompt(prompt_id: int, prompt: PromptInput):
     """Update an existing prompt."""
     try:
-        success = db.edit_system_prompt(prompt_id, prompt.name, prompt.text)
+        success = await asyncio.to_thread(db.edit_system_prompt, prompt_id, prompt.name, prompt.text)
         if not success:
             raise HTTPException(status_code=404, detail="Prompt not found")
+        invalidate_active_prompt()
         return {"status": "success"}
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="A prompt with this name already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1202,16 +1629,17 @@ async def delete_prompt(prompt_id: int):
     """
     try:
         # Get prompt to check if it's the default one
-        prompt = db.get_prompt_by_id(prompt_id)
+        prompt = await asyncio.to_thread(db.get_prompt_by_id, prompt_id)
         if not prompt:
             raise HTTPException(status_code=404, detail="Prompt not found")
 
         if prompt["prompt_name"] == "default":
             raise HTTPException(status_code=403, detail="Cannot delete the default prompt")
 
-        success = db.delete_system_prompt(prompt_id)
+        success = await asyncio.to_thread(db.delete_system_prompt, prompt_id)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete prompt")
+        invalidate_active_prompt()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1232,7 +1660,8 @@ async def activate_prompt(prompt_id: int):
         HTTPException: If activation fails or prompt not found
     """
     try:
-        success = db.set_active_prompt(prompt_id)
+        success = await asyncio.to_thread(db.set_active_prompt, prompt_id)
+        invalidate_active_prompt()
         if not success:
             raise HTTPException(status_code=404, detail="Prompt not found")
         return {"status": "success"}
@@ -1244,14 +1673,7 @@ async def activate_prompt(prompt_id: int):
 async def get_active_prompt():
     """Get the currently active system prompt."""
     try:
-        prompt = db.get_active_prompt()
-        if not prompt:
-            # If no active prompt, get default
-            prompt = db.get_prompt_by_name("default")
-            if prompt:
-                # Make default prompt active
-                db.set_active_prompt(prompt["id"])
-
+        prompt = await get_cached_active_prompt()
         if not prompt:
             raise HTTPException(status_code=404, detail="No active or default prompt found")
 
@@ -1263,24 +1685,47 @@ async def get_active_prompt():
 
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket, client_id)
+    ip = websocket.client.host if websocket.client else ""
+    if len(manager.active_connections) >= MAX_WS_CONNECTIONS or _ws_per_ip[ip] >= MAX_WS_PER_IP:
+        # 1013: try again later
+        logger.warning(f"Rejecting websocket for client {client_id} from {ip}: connection limit reached")
+        await websocket.close(code=1013)
+        return
+
+    _ws_per_ip[ip] += 1
     try:
+        await manager.connect(websocket, client_id)
         while True:
             message = await websocket.receive_text()
-            if message == "stop_generation":
-                manager.set_generating(client_id, False)
+            try:
+                # The frontend sends JSON messages, e.g. {"type": "subscribe", "conversation_id": ...}
+                data = orjson.loads(message) if message.startswith("{") else {"type": message}
+            except orjson.JSONDecodeError:
+                continue
+
+            if data.get("type") == "stop_generation":
+                manager.stop(client_id)
                 logger.info(f"Received stop signal for client {client_id}")
+            elif data.get("type") == "subscribe":
+                if data.get("conversation_id"):
+                    manager.subscribe(client_id, data["conversation_id"])
+                else:
+                    manager.unsubscribe(client_id)
             else:
                 # Handle other WebSocket messages
                 pass
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
+    finally:
+        _ws_per_ip[ip] -= 1
+        if _ws_per_ip[ip] <= 0:
+            del _ws_per_ip[ip]
 
 
 @app.get("/attachments/{attachment_id}")
 async def get_attachment(attachment_id: str):
     """Serve attachment files."""
-    attachment = db.get_attachment(attachment_id)
+    attachment = await asyncio.to_thread(db.get_attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
 
@@ -1288,4 +1733,19 @@ async def get_attachment(attachment_id: str):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(file_path, filename=attachment["file_name"], media_type=attachment["file_type"])
+    return FileResponse(
+        file_path,
+        filename=attachment["file_name"],
+        media_type=attachment["file_type"],
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+
+@app.get("/uploads/{file_name}")
+async def get_upload(file_name: str):
+    """Serve an uploaded file for providers fetching it by URL, as a download rather than inline on this origin."""
+    file_path = TEMP_DIR / file_name
+    if Path(file_name).name != file_name or not file_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return FileResponse(file_path, filename=file_name, headers={"X-Content-Type-Options": "nosniff"})
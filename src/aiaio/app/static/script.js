@@ -416,12 +416,22 @@ function connectWebSocket() {
 
     state.ws = new WebSocket(wsUrl);
 
-    state.ws.onopen = () => console.log('WebSocket connected');
+    state.ws.onopen = () => {
+        console.log('WebSocket connected');
+        // Re-join the open conversation's room after a reconnect
+        subscribeConversation(state.currentConversationId);
+    };
     state.ws.onmessage = (event) => handleWebSocketMessage(JSON.parse(event.data));
     state.ws.onclose = () => setTimeout(connectWebSocket, 3000);
     state.ws.onerror = (error) => console.error('WebSocket error:', error);
 }
 
+function subscribeConversation(conversationId) {
+    if (state.ws && state.ws.readyState === WebSocket.OPEN) {
+        state.ws.send(JSON.stringify({ type: 'subscribe', conversation_id: conversationId }));
+    }
+}
+
 function handleWebSocketMessage(data) {
     switch (data.type) {
         case 'conversation_created':
@@ -757,6 +767,7 @@ async function editConversationTitle(conversationId, event) {
 async function loadConversation(conversationId) {
     try {
         state.currentConversationId = conversationId;
+        subscribeConversation(conversationId);
         const response = await fetch(`/conversations/${conversationId}`);
         const data = await response.json();
 
@@ -796,6 +807,7 @@ async function startNewConversation() {
         </div>
     `;
     state.currentConversationId = null;
+    subscribeConversation(null);
     elements.messageInput.value = '';
     elements.messageInput.style.height = 'auto';
     elements.fileInput.value = '';
@@ -1110,6 +1122,7 @@ elements.chatForm.addEventListener('submit', async (e) => {
             });
             const data = await response.json();
             state.currentConversationId = data.conversation_id;
+            subscribeConversation(data.conversation_id);
 
             // Update URL without reloading
             const url = new URL(window.location);
@@ -1190,7 +1203,7 @@ elements.messageInput.addEventListener('keydown', function (e) {
 elements.stopButton.addEventListener('click', () => {
     if (state.abortController) state.abortController.abort();
     if (state.ws && state.ws.readyState === WebSocket.OPEN) {
-        state.ws.send(JSON.stringify({ type: 'stop_generation' })); // Assuming backend handles this
+        state.ws.send(JSON.stringify({ type: 'stop_generation' }));
     }
 });
 
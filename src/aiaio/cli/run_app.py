@@ -52,7 +52,16 @@ class RunAppCommand(BaseCLICommand):
         logger.info("Starting aiaio server.")
 
         try:
-            uvicorn.run("aiaio.app.app:app", host=self.host, port=self.port, workers=self.workers)
+            # "auto" picks uvloop where it's available (not on Windows), httptools is the C HTTP parser
+            uvicorn.run(
+                "aiaio.app.app:app",
+                host=self.host,
+                port=self.port,
+                workers=self.workers,
+                loop="auto",
+                http="httptools",
+                ws="websockets",
+            )
         except KeyboardInterrupt:
             logger.warning("Server terminated by user.")
             sys.exit(0)
@@ -1,8 +1,14 @@
+import asyncio
 import os
+import queue
 import sqlite3
+import threading
 import time
 import uuid
-from typing import Dict, List, Optional
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from .prompts import SYSTEM_PROMPTS
 
@@ -15,7 +21,9 @@ CREATE TABLE conversations (
     updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
     last_updated REAL DEFAULT (strftime('%s.%f', 'now')),
     summary TEXT,
-    project_id TEXT REFERENCES projects(project_id)
+    project_id TEXT REFERENCES projects(project_id) ON DELETE CASCADE,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_at REAL
 );
 
 CREATE TABLE messages (
@@ -26,7 +34,7 @@ CREATE TABLE messages (
     content TEXT,
     created_at REAL DEFAULT (strftime('%s.%f', 'now')),
     updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
-    FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id)
+    FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id) ON DELETE CASCADE
 );
 
 CREATE TABLE attachments (
@@ -38,7 +46,7 @@ CREATE TABLE attachments (
     file_size INTEGER,
     created_at REAL DEFAULT (strftime('%s.%f', 'now')),
     updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
-    FOREIGN KEY (message_id) REFERENCES messages(message_id)
+    FOREIGN KEY (message_id) REFERENCES messages(message_id) ON DELETE CASCADE
 );
 
 CREATE TABLE providers (
@@ -86,6 +94,224 @@ CREATE TABLE projects (
 );
 """
 
+# Indexes for the per-conversation history reads, the attachment lookups, the per-project conversation list and
+# the ordered per-provider model list, plus partial indexes holding only the flagged default model, default
+# provider and active prompt rows, applied to new and existing databases
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_messages_conv_created ON messages(conversation_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_attachments_mid ON attachments(message_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_project ON conversations(project_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_models_default ON models(provider_id) WHERE is_default = true;
+CREATE INDEX IF NOT EXISTS idx_models_provider_default_name ON models(provider_id, is_default DESC, model_name);
+CREATE INDEX IF NOT EXISTS idx_providers_default ON providers(id) WHERE is_default = true;
+CREATE INDEX IF NOT EXISTS idx_system_prompts_active ON system_prompts(id) WHERE is_active = true;
+"""
+
+# Same rebuild for conversations.project_id before schema version 7. The messages trigger is dropped first since
+# it names the table being swapped, it's recreated from _TRIGGERS afterwards.
+_PROJECT_CASCADE_MIGRATION = """
+PRAGMA foreign_keys=OFF;
+BEGIN;
+DROP TRIGGER IF EXISTS trg_messages_touch_conversation;
+CREATE TABLE conversations_new (
+    conversation_id TEXT PRIMARY KEY,
+    created_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    last_updated REAL DEFAULT (strftime('%s.%f', 'now')),
+    summary TEXT,
+    project_id TEXT REFERENCES projects(project_id) ON DELETE CASCADE,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_at REAL
+);
+INSERT INTO conversations_new
+    SELECT conversation_id, created_at, updated_at, last_updated, summary, project_id, message_count, last_message_at
+    FROM conversations;
+DROP TABLE conversations;
+ALTER TABLE conversations_new RENAME TO conversations;
+COMMIT;
+PRAGMA foreign_keys=ON;
+"""
+
+# Keeps last_updated and the message counters on conversations in step with new messages inside the
+# INSERT itself. Messages are only ever removed together with their conversation, so there's no delete
+# counterpart. Dropped first so migrations replace an older body.
+_TRIGGERS = """
+DROP TRIGGER IF EXISTS trg_messages_touch_conversation;
+CREATE TRIGGER trg_messages_touch_conversation AFTER INSERT ON messages
+BEGIN
+    UPDATE conversations
+    SET last_updated = NEW.created_at, message_count = message_count + 1, last_message_at = NEW.created_at
+    WHERE conversation_id = NEW.conversation_id;
+END;
+"""
+
+# Foreign keys can't be altered in place, so databases from before schema version 2 get messages and
+# attachments rebuilt with ON DELETE CASCADE. Enforcement is off while the tables are swapped, and the
+# indexes and triggers dropped with the old tables are recreated afterwards.
+_CASCADE_MIGRATION = """
+PRAGMA foreign_keys=OFF;
+BEGIN;
+CREATE TABLE messages_new (
+    message_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    role TEXT CHECK(role IN ('user', 'assistant', 'system')),
+    content_type TEXT CHECK(content_type IN ('text', 'image', 'audio', 'video', 'file')),
+    content TEXT,
+    created_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id) ON DELETE CASCADE
+);
+INSERT INTO messages_new
+    SELECT message_id, conversation_id, role, content_type, content, created_at, updated_at FROM messages;
+DROP TABLE messages;
+ALTER TABLE messages_new RENAME TO messages;
+
+CREATE TABLE attachments_new (
+    attachment_id TEXT PRIMARY KEY,
+    message_id TEXT,
+    file_name TEXT,
+    file_path TEXT,
+    file_type TEXT,
+    file_size INTEGER,
+    created_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    updated_at REAL DEFAULT (strftime('%s.%f', 'now')),
+    FOREIGN KEY (message_id) REFERENCES messages(message_id) ON DELETE CASCADE
+);
+INSERT INTO attachments_new
+    SELECT attachment_id, message_id, file_name, file_path, file_type, file_size, created_at, updated_at
+    FROM attachments;
+DROP TABLE attachments;
+ALTER TABLE attachments_new RENAME TO attachments;
+COMMIT;
+PRAGMA foreign_keys=ON;
+"""
+
+# Providers seeded into a new database, each with its (model_name, is_default, is_multimodal) models
+_DEFAULT_PROVIDERS = (
+    (
+        ("Custom", True, 1.0, 0.95, "none", True, "http://localhost:8000/v1", ""),
+        (("meta-llama/Llama-3.2-1B-Instruct", True, False),),
+    ),
+    (
+        ("Google", False, 1.0, 0.95, "low", False, "https://generativelanguage.googleapis.com/v1beta", ""),
+        (
+            ("gemini-3-pro-preview", True, True),
+            ("gemini-2.5-pro", False, True),
+            ("gemini-2.5-flash", False, True),
+            ("gemini-2.5-flash-lite", False, True),
+        ),
+    ),
+    (
+        ("OpenAI", False, 1.0, 0.95, "low", False, "https://api.openai.com/v1", ""),
+        (
+            ("gpt-5.1-2025-11-13", True, True),
+            ("gpt-5-mini-2025-08-07", False, True),
+            ("gpt-5-nano-2025-08-07", False, True),
+            ("gpt-oss-120b", False, False),
+        ),
+    ),
+)
+
+# Statements on the message, edit and summary write paths. Connections are long-lived, so keeping the text
+# identical on every call lets each connection's statement cache hand back the already-prepared statement.
+# Ids are generated by SQLite in the same 32 hex character form as uuid4().hex and handed back with RETURNING.
+# Timestamps, including updated_at, are bound from time.time(): SQLite's 'now' only has millisecond resolution,
+# back-to-back messages have to keep their order, and '%s.%f' formats to text rather than a REAL.
+_SQL_NEW_ID = "lower(hex(randomblob(16)))"
+
+# Without a project the conversation goes to the oldest one, which is the default "General" project
+_SQL_INSERT_CONVERSATION = f"""INSERT INTO conversations (conversation_id, project_id)
+   VALUES ({_SQL_NEW_ID}, COALESCE(?, (SELECT project_id FROM projects ORDER BY created_at ASC LIMIT 1)))
+   RETURNING conversation_id"""
+
+_SQL_INSERT_PROJECT = f"""INSERT INTO projects (project_id, name, description, system_prompt)
+   VALUES ({_SQL_NEW_ID}, ?, ?, ?)
+   RETURNING project_id"""
+
+_SQL_INSERT_MESSAGE = f"""INSERT INTO messages
+   (message_id, conversation_id, role, content_type, content, created_at)
+   VALUES ({_SQL_NEW_ID}, ?, ?, ?, ?, ?)
+   RETURNING message_id"""
+
+_SQL_INSERT_ATTACHMENT = f"""INSERT INTO attachments
+   (attachment_id, message_id, file_name, file_path, file_type, file_size, created_at)
+   VALUES ({_SQL_NEW_ID}, ?, ?, ?, ?, ?, ?)"""
+
+# Bulk imports pick their ids up front, executemany can't hand back RETURNING rows
+_SQL_IMPORT_MESSAGE = """INSERT INTO messages
+   (message_id, conversation_id, role, content_type, content, created_at)
+   VALUES (?, ?, ?, ?, ?, ?)"""
+
+_SQL_UPDATE_SUMMARY = """UPDATE conversations
+   SET summary = ?, updated_at = ?
+   WHERE conversation_id = ?"""
+
+_SQL_EDIT_MESSAGE = """UPDATE messages
+   SET content = ?, updated_at = ?
+   WHERE message_id = ? AND role != 'system'
+   RETURNING role, conversation_id"""
+
+# Applied to every connection: fewer fsyncs per commit, a 20 MB page cache, in-memory temp
+# tables, a 256 MB memory map, waiting on locks instead of failing with SQLITE_BUSY and
+# enforced foreign keys
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Stored in PRAGMA user_version once the schema is created or migrated; bump it when adding a migration
+SCHEMA_VERSION = 8
+
+# Messages read per query when iterating over a conversation's history
+HISTORY_PAGE_SIZE = 256
+
+# Prepared statements kept per connection, enough for every distinct statement the app issues
+STATEMENT_CACHE_SIZE = 256
+
+# Number of long-lived read connections kept open per database
+READ_POOL_SIZE = 4
+
+# Maximum number of queued writes committed in a single transaction
+WRITE_BATCH_SIZE = 64
+
+# How long the writer waits for more writes to coalesce before committing (seconds)
+WRITE_BATCH_WINDOW = 0.001
+
+# Pending writes beyond this make submitters wait instead of growing the queue
+WRITE_QUEUE_SIZE = 1024
+
+
+def _dict_factory(cursor: sqlite3.Cursor, row: Tuple) -> Dict:
+    """Row factory building the dicts the API returns directly, without an intermediate `sqlite3.Row`."""
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+@dataclass(slots=True)
+class Message:
+    """A conversation message along with its attachments.
+
+    Attributes:
+        role (str): Role of the message sender ('user', 'assistant', or 'system')
+        content (str): Content of the message
+        message_id (str, optional): Unique identifier of the stored message
+        conversation_id (str, optional): ID of the conversation the message belongs to
+        content_type (str): Type of content. Defaults to "text".
+        created_at (float, optional): Creation timestamp
+        attachments (List[Dict]): Attachment metadata of the message
+    """
+
+    role: str
+    content: str
+    message_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    content_type: str = "text"
+    created_at: Optional[float] = None
+    attachments: List[Dict] = field(default_factory=list)
+
 
 class ChatDatabase:
     """A class to manage chat-related database operations.
@@ -104,7 +330,116 @@ class ChatDatabase:
             db_path (str, optional): Path to the SQLite database file. Defaults to "chatbot.db".
         """
         self.db_path = db_path
+        # An in-memory database is opened as a named shared-cache one, so the writer, the pooled readers and
+        # the schema setup all see the same data instead of each opening their own empty database
+        self._memory_uri = f"file:aiaio-{uuid.uuid4().hex}?mode=memory&cache=shared" if db_path == ":memory:" else None
+
+        # One writer connection serialized by a lock, plus a pool of read-only connections
+        # that WAL lets read concurrently with the writer. The writer is opened first, it also
+        # keeps an in-memory database alive.
+        self._write_conn = self._open_connection()
+        self._write_conn.isolation_level = None
         self._init_db()
+        self._write_lock = threading.RLock()
+        # Open `batch` blocks, only touched by the thread holding the write lock
+        self._batch_depth = 0
+        self._read_pool = queue.Queue()
+        for _ in range(READ_POOL_SIZE):
+            self._read_pool.put(self._open_connection(readonly=True))
+
+    def _open_connection(self, readonly: bool = False) -> sqlite3.Connection:
+        """Open a tuned connection with `sqlite3.Row` rows, shareable across threads."""
+        if self._memory_uri:
+            conn = sqlite3.connect(
+                self._memory_uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            if readonly:
+                # Shared-cache readers would fail with SQLITE_LOCKED while the writer holds a table lock,
+                # busy_timeout doesn't cover those
+                conn.execute("PRAGMA read_uncommitted=ON")
+        elif readonly:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _read(self):
+        """Borrow one of the pooled read-only connections for a single read.
+
+        The read runs in its own transaction, so methods issuing several queries, like the history
+        loads, see one consistent snapshot even while the writer commits in between.
+
+        Yields:
+            sqlite3.Connection: Connection with the default tuple rows
+        """
+        conn = self._read_pool.get()
+        conn.row_factory = None
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+            self._read_pool.put(conn)
+
+    @contextmanager
+    def _write(self):
+        """Run a write on the writer connection inside a `BEGIN IMMEDIATE` transaction.
+
+        The write lock is taken up front, the transaction is committed on success and rolled back on error.
+        Inside `batch` the write joins the transaction that is already open and leaves the commit to it.
+
+        Yields:
+            sqlite3.Connection: Connection with the default tuple rows
+        """
+        with self._write_lock:
+            conn = self._write_conn
+            conn.row_factory = None
+            if self._batch_depth:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT can leave the transaction open, don't let later writes join it
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def batch(self):
+        """Group several writes into a single transaction and commit.
+
+        Writes made on this database inside the block share one `BEGIN IMMEDIATE`, other writers wait
+        until the block exits. Everything is rolled back if the block raises.
+
+        Example:
+            with db.batch():
+                db.set_active_prompt(prompt_id)
+                db.delete_system_prompt(old_prompt_id)
+
+        Yields:
+            ChatDatabase: This database
+        """
+        with self._write():
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+
+    def close(self):
+        """Close the writer and the pooled read connections."""
+        with self._write_lock:
+            self._write_conn.close()
+        while not self._read_pool.empty():
+            self._read_pool.get_nowait().close()
 
     def _init_db(self):
         """Initialize the database schema.
@@ -112,149 +447,138 @@ class ChatDatabase:
         Creates tables if they don't exist or if the database is new.
         Also handles schema migrations for existing databases.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            # Check if main table exists
-            cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='conversations'")
-            table_exists = cursor.fetchone() is not None
-
-            if not table_exists:
-                # Execute schema
-                conn.executescript(_DB)
-
-                # Insert default providers and models
-                providers_count = conn.execute("SELECT COUNT(*) FROM providers").fetchone()[0]
-                if providers_count == 0:
-                    # Custom provider
-                    cursor = conn.execute(
-                        """INSERT INTO providers
-                           (name, is_default, temperature, top_p, reasoning_effort, use_for_summarization, host, api_key)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                        ("Custom", True, 1.0, 0.95, "none", True, "http://localhost:8000/v1", ""),
-                    )
-                    custom_id = cursor.lastrowid
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (custom_id, "meta-llama/Llama-3.2-1B-Instruct", True, False),
-                    )
-
-                    # Google provider
-                    cursor = conn.execute(
-                        """INSERT INTO providers
-                           (name, is_default, temperature, top_p, reasoning_effort, use_for_summarization, host, api_key)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            "Google",
-                            False,
-                            1.0,
-                            0.95,
-                            "low",
-                            False,
-                            "https://generativelanguage.googleapis.com/v1beta",
-                            "",
-                        ),
-                    )
-                    google_id = cursor.lastrowid
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (google_id, "gemini-3-pro-preview", True, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (google_id, "gemini-2.5-pro", False, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (google_id, "gemini-2.5-flash", False, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (google_id, "gemini-2.5-flash-lite", False, True),
-                    )
-
-                    # OpenAI provider
-                    cursor = conn.execute(
-                        """INSERT INTO providers
-                           (name, is_default, temperature, top_p, reasoning_effort, use_for_summarization, host, api_key)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                        ("OpenAI", False, 1.0, 0.95, "low", False, "https://api.openai.com/v1", ""),
-                    )
-                    openai_id = cursor.lastrowid
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (openai_id, "gpt-5.1-2025-11-13", True, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (openai_id, "gpt-5-mini-2025-08-07", False, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (openai_id, "gpt-5-nano-2025-08-07", False, True),
-                    )
-                    conn.execute(
-                        "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                        (openai_id, "gpt-oss-120b", False, False),
-                    )
-
-                # Insert system prompts
-                conn.execute(
-                    """INSERT INTO system_prompts (prompt_name, prompt_text, is_active)
-                       VALUES (?, ?, ?)""",
+        with closing(self._open_connection()) as conn, conn:
+            # Only takes effect on a brand new file, before the WAL switch below writes its header. Pages freed by
+            # deletes are then kept on a freelist until `vacuum_incremental` reclaims them, instead of being
+            # compacted on every commit. On existing databases this is a no-op.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+            if not self._memory_uri:
+                # WAL is persistent, so switching once here covers every later connection to the file
+                conn.execute("PRAGMA journal_mode=WAL")
+
+            # The introspection below only runs when the file predates SCHEMA_VERSION, so a current
+            # database skips straight to the default-project check
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                self._migrate_schema(conn, version)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            # Seed the default project only while there are none, in the same statement that checks
+            row = conn.execute(
+                f"""INSERT INTO projects (project_id, name, description, system_prompt)
+                    SELECT {_SQL_NEW_ID}, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM projects)
+                    RETURNING project_id""",
+                ("General", "Default project for general conversations", SYSTEM_PROMPTS["default"].strip()),
+            ).fetchone()
+            if row:
+                # Migrate existing conversations to default project
+                conn.execute("UPDATE conversations SET project_id = ? WHERE project_id IS NULL", (row[0],))
+
+    def _migrate_schema(self, conn: sqlite3.Connection, version: int):
+        """Create the schema on a new database or bring an older one up to SCHEMA_VERSION."""
+        # Check if main table exists
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='conversations'")
+        table_exists = cursor.fetchone() is not None
+
+        if not table_exists:
+            # Execute schema. The script leaves its transaction open so the seed rows below are committed
+            # together with the schema when `_init_db` leaves its `with conn:` block, in a single commit
+            conn.executescript("BEGIN;" + _DB + _INDEXES + _TRIGGERS)
+
+            # Insert default providers, then all of their models in one batch, resolving each provider by name
+            conn.executemany(
+                """INSERT INTO providers
+                   (name, is_default, temperature, top_p, reasoning_effort, use_for_summarization, host, api_key)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [provider for provider, _ in _DEFAULT_PROVIDERS],
+            )
+            conn.executemany(
+                """INSERT INTO models (provider_id, model_name, is_default, is_multimodal)
+                   SELECT id, ?, ?, ? FROM providers WHERE name = ?""",
+                [(*model, provider[0]) for provider, models in _DEFAULT_PROVIDERS for model in models],
+            )
+
+            # Insert system prompts
+            conn.executemany(
+                "INSERT INTO system_prompts (prompt_name, prompt_text, is_active) VALUES (?, ?, ?)",
+                [
                     ("summary", SYSTEM_PROMPTS["summary"].strip(), False),
-                )
-                conn.execute(
-                    """INSERT INTO system_prompts (prompt_name, prompt_text, is_active)
-                       VALUES (?, ?, ?)""",
                     ("default", SYSTEM_PROMPTS["default"].strip(), True),
-                )
-            else:
-                # Check if summary column exists
-                columns = conn.execute("PRAGMA table_info(conversations)").fetchall()
-                column_names = [col[1] for col in columns]
-                if "summary" not in column_names:
-                    conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
-
-                # Check if project_id column exists
-                if "project_id" not in column_names:
-                    conn.execute(
-                        "ALTER TABLE conversations ADD COLUMN project_id TEXT REFERENCES projects(project_id)"
-                    )
-
-            # Ensure default project exists
-            # Check if projects table exists first (it might not if we are migrating from very old version, but schema above creates it)
-            # If we just created schema, it exists. If we are migrating, we might need to create it? 
-            # The original code assumed if db exists, we just migrate columns. 
-            # But projects table was added later. 
-            # Let's check if projects table exists
-            projects_table = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='projects'").fetchone()
-            if not projects_table:
-                 conn.execute("""
-                    CREATE TABLE projects (
-                        project_id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        description TEXT,
-                        system_prompt TEXT,
-                        created_at REAL DEFAULT (strftime('%s.%f', 'now')),
-                        updated_at REAL DEFAULT (strftime('%s.%f', 'now'))
-                    );
-                 """)
-
-            projects_count = conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
-            if projects_count == 0:
-                default_project_id = str(uuid.uuid4())
+                ],
+            )
+        else:
+            if version < 2:
+                conn.executescript(_CASCADE_MIGRATION)
+
+            # Check if summary column exists
+            columns = conn.execute("PRAGMA table_info(conversations)").fetchall()
+            column_names = [col[1] for col in columns]
+            if "summary" not in column_names:
+                conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
+
+            # Check if project_id column exists
+            if "project_id" not in column_names:
+                conn.execute("ALTER TABLE conversations ADD COLUMN project_id TEXT REFERENCES projects(project_id)")
+
+            # Add the message counters and backfill them from the existing messages
+            if "message_count" not in column_names:
+                conn.execute("ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE conversations ADD COLUMN last_message_at REAL")
                 conn.execute(
-                    "INSERT INTO projects (project_id, name, description, system_prompt) VALUES (?, ?, ?, ?)",
-                    (
-                        default_project_id,
-                        "General",
-                        "Default project for general conversations",
-                        SYSTEM_PROMPTS["default"].strip(),
-                    ),
+                    """UPDATE conversations SET
+                       message_count = (
+                           SELECT COUNT(*) FROM messages m
+                           WHERE m.conversation_id = conversations.conversation_id
+                       ),
+                       last_message_at = (
+                           SELECT MAX(m.created_at) FROM messages m
+                           WHERE m.conversation_id = conversations.conversation_id
+                       )""",
                 )
 
-                # Migrate existing conversations to default project
-                # Check if project_id column exists in conversations (we added it above if missing)
-                conn.execute("UPDATE conversations SET project_id = ? WHERE project_id IS NULL", (default_project_id,))
+            if version < 7:
+                conn.executescript(_PROJECT_CASCADE_MIGRATION)
+
+            # Superseded by the partial idx_models_default
+            conn.execute("DROP INDEX IF EXISTS idx_models_provider_default")
+            conn.executescript(_INDEXES + _TRIGGERS)
+
+        # Ensure default project exists
+        # Check if projects table exists first (it might not if we are migrating from very old version,
+        # but schema above creates it)
+        # If we just created schema, it exists. If we are migrating, we might need to create it?
+        # The original code assumed if db exists, we just migrate columns.
+        # But projects table was added later.
+        # Let's check if projects table exists
+        projects_table = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='projects'"
+        ).fetchone()
+        if not projects_table:
+            conn.execute(
+                """
+                CREATE TABLE projects (
+                    project_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    system_prompt TEXT,
+                    created_at REAL DEFAULT (strftime('%s.%f', 'now')),
+                    updated_at REAL DEFAULT (strftime('%s.%f', 'now'))
+                );
+            """
+            )
+
+    def vacuum_incremental(self, pages: int = 1000) -> None:
+        """Return up to `pages` free pages to the filesystem.
+
+        Only effective on databases created with incremental auto-vacuum.
+
+        Args:
+            pages (int, optional): Maximum number of pages to reclaim. Defaults to 1000.
+        """
+        # Run as a script in autocommit mode, `execute` would only step the pragma once and free a single page
+        with self._write_lock:
+            self._write_conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
 
     def create_conversation(self, project_id: Optional[str] = None) -> str:
         """Create a new conversation.
@@ -265,26 +589,8 @@ class ChatDatabase:
         Returns:
             str: Unique identifier for the created conversation.
         """
-        conversation_id = str(uuid.uuid4())
-        with sqlite3.connect(self.db_path) as conn:
-            if project_id:
-                conn.execute(
-                    "INSERT INTO conversations (conversation_id, project_id) VALUES (?, ?)",
-                    (conversation_id, project_id),
-                )
-            else:
-                # Fallback to default project if none specified
-                # Find a default project or the first one
-                project = conn.execute("SELECT project_id FROM projects ORDER BY created_at ASC LIMIT 1").fetchone()
-                if project:
-                    conn.execute(
-                        "INSERT INTO conversations (conversation_id, project_id) VALUES (?, ?)",
-                        (conversation_id, project[0]),
-                    )
-                else:
-                    # Should not happen due to init_db, but safe fallback
-                    conn.execute("INSERT INTO conversations (conversation_id) VALUES (?)", (conversation_id,))
-        return conversation_id
+        with self._write() as conn:
+            return conn.execute(_SQL_INSERT_CONVERSATION, (project_id or None,)).fetchone()[0]
 
     def add_message(
         self,
@@ -306,97 +612,230 @@ class ChatDatabase:
         Returns:
             str: Unique identifier for the created message
         """
-        message_id = str(uuid.uuid4())
-        current_time = time.time()
+        with self._write() as conn:
+            return self._add_message(conn, conversation_id, role, content, content_type, attachments)
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """INSERT INTO messages
-                   (message_id, conversation_id, role, content_type, content, created_at)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (message_id, conversation_id, role, content_type, content, current_time),
-            )
+    def _add_message(
+        self,
+        conn: sqlite3.Connection,
+        conversation_id: str,
+        role: str,
+        content: str,
+        content_type: str = "text",
+        attachments: Optional[List[Dict]] = None,
+    ) -> str:
+        """Insert a message on an existing connection without committing.
 
-            conn.execute(
-                """UPDATE conversations
-                   SET last_updated = ?
-                   WHERE conversation_id = ?""",
-                (current_time, conversation_id),
-            )
+        See `add_message` for the arguments.
+        """
+        current_time = time.time()
 
-            if attachments:
-                for att in attachments:
-                    conn.execute(
-                        """INSERT INTO attachments
-                           (attachment_id, message_id, file_name, file_path, file_type, file_size, created_at)
-                           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            str(uuid.uuid4()),
-                            message_id,
-                            att["name"],
-                            att["path"],
-                            att["type"],
-                            att["size"],
-                            current_time,
-                        ),
-                    )
+        message_id = conn.execute(
+            _SQL_INSERT_MESSAGE, (conversation_id, role, content_type, content, current_time)
+        ).fetchone()[0]
+
+        if attachments:
+            conn.executemany(
+                _SQL_INSERT_ATTACHMENT,
+                [
+                    (message_id, att["name"], att["path"], att["type"], att["size"], current_time)
+                    for att in attachments
+                ],
+            )
 
         return message_id
 
-    def get_conversation_history(self, conversation_id: str) -> List[Dict]:
-        """Retrieve the full history of a conversation including attachments.
+    def add_messages(self, conversation_id: str, messages: List[Dict]) -> List[str]:
+        """Add many messages to a conversation in a single transaction.
+
+        Meant for importing or replaying history, each message takes the same keys as the
+        `add_message` arguments plus an optional "created_at" timestamp.
 
         Args:
             conversation_id (str): ID of the conversation
+            messages (List[Dict]): Messages with "role", "content" and optionally "content_type",
+                "attachments" and "created_at"
 
         Returns:
-            List[Dict]: List of messages with their attachments in chronological order
-        """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            messages = conn.execute(
-                """SELECT m.*, a.attachment_id, a.file_name, a.file_path, a.file_type, a.file_size
-                   FROM messages m
-                   LEFT JOIN attachments a ON m.message_id = a.message_id
-                   WHERE m.conversation_id = ?
-                   ORDER BY m.created_at ASC""",
+            List[str]: Unique identifiers of the created messages, in the order given
+        """
+        if not messages:
+            return []
+
+        current_time = time.time()
+        rows = [
+            (
+                uuid.uuid4().hex,
+                conversation_id,
+                msg["role"],
+                msg.get("content_type", "text"),
+                msg["content"],
+                # Messages without a timestamp keep the order they were given in
+                msg.get("created_at", current_time + i * 1e-6),
+            )
+            for i, msg in enumerate(messages)
+        ]
+        attachment_rows = [
+            (row[0], att["name"], att["path"], att["type"], att["size"], row[5])
+            for row, msg in zip(rows, messages)
+            for att in msg.get("attachments") or ()
+        ]
+
+        with self._write() as conn:
+            conn.executemany(_SQL_IMPORT_MESSAGE, rows)
+            if attachment_rows:
+                conn.executemany(_SQL_INSERT_ATTACHMENT, attachment_rows)
+            # The insert trigger leaves the timestamp of the last row, which may be older than messages already
+            # there since imports aren't necessarily in order. Recompute from the newest message instead.
+            conn.execute(
+                """UPDATE conversations SET (last_updated, last_message_at) = (
+                       SELECT MAX(created_at), MAX(created_at) FROM messages WHERE conversation_id = ?1
+                   )
+                   WHERE conversation_id = ?1""",
                 (conversation_id,),
-            ).fetchall()
+            )
+
+        return [row[0] for row in rows]
 
-        # Group attachments by message_id
-        message_dict = {}
-        for row in messages:
-            message_id = row["message_id"]
-            if message_id not in message_dict:
-                message_dict[message_id] = {
-                    key: row[key]
-                    for key in ["message_id", "conversation_id", "role", "content_type", "content", "created_at"]
-                }
-                message_dict[message_id]["attachments"] = []
-
-            if row["attachment_id"]:
-                message_dict[message_id]["attachments"].append(
+    def _load_history(
+        self, conn: sqlite3.Connection, where: str, params: Tuple, limit: Optional[int] = None
+    ) -> List[Message]:
+        """Load the messages matching `where` with their attachments, in chronological order.
+
+        Messages and attachments are fetched with two queries and stitched together by message_id,
+        so the message columns aren't repeated for every attachment row.
+
+        Args:
+            conn (sqlite3.Connection): Connection to read from
+            where (str): Filter on the messages table, aliased as `m`
+            params (Tuple): Parameters of the filter
+            limit (Optional[int], optional): Only load the first `limit` matching messages. Defaults to None.
+
+        Returns:
+            List[Message]: List of messages with their attachments in chronological order
+        """
+        # rowid breaks ties between messages created at the same time in insertion order, it's also the last
+        # column of idx_messages_conv_created so the index still serves the ordering
+        order = "ORDER BY m.created_at ASC, m.rowid ASC"
+        if limit is not None:
+            order += " LIMIT ?"
+            params = (*params, limit)
+
+        # Columns in `Message` field order
+        messages = [
+            Message(*row)
+            for row in conn.execute(
+                f"""SELECT m.role, m.content, m.message_id, m.conversation_id, m.content_type, m.created_at
+                    FROM messages m
+                    WHERE {where}
+                    {order}""",
+                params,
+            )
+        ]
+
+        by_id = {message.message_id: message for message in messages}
+        for row in conn.execute(
+            f"""SELECT a.message_id, a.attachment_id, a.file_name, a.file_path, a.file_type, a.file_size
+                FROM attachments a
+                WHERE a.message_id IN (SELECT m.message_id FROM messages m WHERE {where} {order})
+                ORDER BY a.rowid""",
+            params,
+        ):
+            message = by_id.get(row[0])
+            if message is not None:
+                message.attachments.append(
                     {
-                        "attachment_id": row["attachment_id"],
-                        "file_name": row["file_name"],
-                        "file_path": row["file_path"],
-                        "file_type": row["file_type"],
-                        "file_size": row["file_size"],
+                        "attachment_id": row[1],
+                        "file_name": row[2],
+                        "file_path": row[3],
+                        "file_type": row[4],
+                        "file_size": row[5],
                     }
                 )
 
-        return list(message_dict.values())
+        return messages
+
+    def get_conversation_history(self, conversation_id: str) -> List[Message]:
+        """Retrieve the full history of a conversation including attachments.
+
+        Args:
+            conversation_id (str): ID of the conversation
+
+        Returns:
+            List[Message]: List of messages with their attachments in chronological order
+        """
+        return list(self.iter_conversation_history(conversation_id))
+
+    def iter_conversation_history(
+        self,
+        conversation_id: str,
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+        page_size: int = HISTORY_PAGE_SIZE,
+    ) -> Iterator[Message]:
+        """Yield the messages of a conversation with their attachments, in chronological order.
+
+        Messages are read a page at a time with keyset pagination on (created_at, rowid), and the
+        read connection is returned to the pool between pages, so a long history is never held in memory
+        or on a connection all at once.
+
+        Args:
+            conversation_id (str): ID of the conversation
+            since (Optional[float], optional): Only yield messages created after this timestamp. Defaults to None.
+            limit (Optional[int], optional): Maximum number of messages to yield. Defaults to None.
+            page_size (int, optional): Number of messages read per query. Defaults to HISTORY_PAGE_SIZE.
+
+        Yields:
+            Message: Messages with their attachments
+        """
+        where, params = "m.conversation_id = ?", (conversation_id,)
+        if since is not None:
+            where, params = f"{where} AND m.created_at > ?", (*params, since)
+
+        remaining = limit
+        after = None
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            page_where, page_params = where, params
+            if after is not None:
+                # Resume after the last message yielded, by its (created_at, rowid) position
+                page_where = f"""{where}
+                    AND (m.created_at, m.rowid) > (SELECT created_at, rowid FROM messages WHERE message_id = ?)"""
+                page_params = (*params, after)
+
+            with self._read() as conn:
+                page = self._load_history(conn, page_where, page_params, size)
+            yield from page
+
+            if len(page) < size:
+                return
+            if remaining is not None:
+                remaining -= len(page)
+            after = page[-1].message_id
+
+    def get_message_content(self, message_id: str) -> Optional[str]:
+        """Get the raw content of a message.
+
+        Args:
+            message_id (str): ID of the message
+
+        Returns:
+            Optional[str]: Message content if found, None otherwise
+        """
+        with self._read() as conn:
+            row = conn.execute("SELECT content FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+            return row[0] if row else None
 
     def get_attachment(self, attachment_id: str) -> Optional[Dict]:
         """Retrieve attachment details by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            row = conn.execute("SELECT * FROM attachments WHERE attachment_id = ?", (attachment_id,)).fetchone()
-            if row:
-                return dict(row)
-            return None
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            row = conn.execute(
+                "SELECT file_name, file_path, file_type FROM attachments WHERE attachment_id = ?", (attachment_id,)
+            ).fetchone()
+            return row
 
-    def get_conversation_history_upto_message_id(self, conversation_id: str, message_id: str) -> List[Dict]:
+    def get_conversation_history_upto_message_id(self, conversation_id: str, message_id: str) -> List[Message]:
         """Retrieve the full history of a conversation including attachments up to but not including a message_id.
 
         Args:
@@ -404,44 +843,15 @@ class ChatDatabase:
             message_id (str): ID of the message
 
         Returns:
-            List[Dict]: List of messages with their attachments in chronological order
-        """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            messages = conn.execute(
-                """SELECT m.*, a.attachment_id, a.file_name, a.file_path, a.file_type, a.file_size
-                   FROM messages m
-                   LEFT JOIN attachments a ON m.message_id = a.message_id
-                   WHERE m.conversation_id = ? AND m.created_at < (
-                       SELECT created_at FROM messages WHERE message_id = ?
-                   )
-                   ORDER BY m.created_at ASC""",
+            List[Message]: List of messages with their attachments in chronological order
+        """
+        with self._read() as conn:
+            return self._load_history(
+                conn,
+                """m.conversation_id = ?
+                   AND (m.created_at, m.rowid) < (SELECT created_at, rowid FROM messages WHERE message_id = ?)""",
                 (conversation_id, message_id),
-            ).fetchall()
-
-        # Group attachments by message_id
-        message_dict = {}
-        for row in messages:
-            message_id = row["message_id"]
-            if message_id not in message_dict:
-                message_dict[message_id] = {
-                    key: row[key]
-                    for key in ["message_id", "conversation_id", "role", "content_type", "content", "created_at"]
-                }
-                message_dict[message_id]["attachments"] = []
-
-            if row["attachment_id"]:
-                message_dict[message_id]["attachments"].append(
-                    {
-                        "attachment_id": row["attachment_id"],
-                        "file_name": row["file_name"],
-                        "file_path": row["file_path"],
-                        "file_type": row["file_type"],
-                        "file_size": row["file_size"],
-                    }
-                )
-
-        return list(message_dict.values())
+            )
 
     def delete_conversation(self, conversation_id: str):
         """Delete a conversation and all its associated messages and attachments.
@@ -449,15 +859,8 @@ class ChatDatabase:
         Args:
             conversation_id (str): ID of the conversation to delete
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """DELETE FROM attachments
-                   WHERE message_id IN (
-                       SELECT message_id FROM messages WHERE conversation_id = ?
-                   )""",
-                (conversation_id,),
-            )
-            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+        with self._write() as conn:
+            # Messages and their attachments go with it through ON DELETE CASCADE
             conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
 
     def get_all_conversations(self, project_id: Optional[str] = None) -> List[Dict]:
@@ -469,26 +872,24 @@ class ChatDatabase:
         Returns:
             List[Dict]: List of conversations with their metadata
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
 
-            query = """SELECT c.*,
-                   COUNT(m.message_id) as message_count,
-                   MAX(m.created_at) as last_message_at
-                   FROM conversations c
-                   LEFT JOIN messages m ON c.conversation_id = m.conversation_id"""
+            # message_count and last_message_at are maintained by the messages insert trigger
+            query = """SELECT conversation_id, created_at, last_updated, summary, project_id,
+                              message_count, last_message_at
+                       FROM conversations"""
 
             params = []
             if project_id:
-                query += " WHERE c.project_id = ?"
+                query += " WHERE project_id = ?"
                 params.append(project_id)
 
-            query += """ GROUP BY c.conversation_id
-                   ORDER BY c.created_at ASC"""
+            query += " ORDER BY created_at ASC"
 
             conversations = conn.execute(query, tuple(params)).fetchall()
 
-        return [dict(conv) for conv in conversations]
+        return conversations
 
     def get_project_for_conversation(self, conversation_id: str) -> Optional[Dict]:
         """Get the project associated with a conversation.
@@ -499,15 +900,15 @@ class ChatDatabase:
         Returns:
             Optional[Dict]: Project data if found, None otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             project = conn.execute(
                 """SELECT p.* FROM projects p
                    JOIN conversations c ON p.project_id = c.project_id
                    WHERE c.conversation_id = ?""",
                 (conversation_id,),
             ).fetchone()
-            return dict(project) if project else None
+            return project
 
     # Project CRUD methods
     def create_project(self, name: str, description: str = "", system_prompt: str = "") -> str:
@@ -521,80 +922,68 @@ class ChatDatabase:
         Returns:
             str: Project ID
         """
-        project_id = str(uuid.uuid4())
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """INSERT INTO projects (project_id, name, description, system_prompt)
-                   VALUES (?, ?, ?, ?)""",
-                (project_id, name, description, system_prompt),
-            )
-        return project_id
+        with self._write() as conn:
+            return conn.execute(_SQL_INSERT_PROJECT, (name, description, system_prompt)).fetchone()[0]
 
     def get_projects(self) -> List[Dict]:
         """Get all projects."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            projects = conn.execute("SELECT * FROM projects ORDER BY created_at ASC").fetchall()
-            return [dict(p) for p in projects]
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            projects = conn.execute(
+                "SELECT project_id, name, description, system_prompt FROM projects ORDER BY created_at ASC"
+            ).fetchall()
+            return projects
 
     def get_project(self, project_id: str) -> Optional[Dict]:
         """Get a project by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             project = conn.execute("SELECT * FROM projects WHERE project_id = ?", (project_id,)).fetchone()
-            return dict(project) if project else None
+            return project
 
     def update_project(self, project_id: str, name: str, description: str, system_prompt: str) -> bool:
         """Update a project."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute(
                 """UPDATE projects
-                   SET name = ?, description = ?, system_prompt = ?, updated_at = strftime('%s.%f', 'now')
+                   SET name = ?, description = ?, system_prompt = ?, updated_at = ?
                    WHERE project_id = ?""",
-                (name, description, system_prompt, project_id),
+                (name, description, system_prompt, time.time(), project_id),
             )
             return cursor.rowcount > 0
 
     def delete_project(self, project_id: str) -> bool:
         """Delete a project and its conversations."""
-        with sqlite3.connect(self.db_path) as conn:
-            # Delete messages for all conversations in project
-            conn.execute(
-                """DELETE FROM messages WHERE conversation_id IN 
-                   (SELECT conversation_id FROM conversations WHERE project_id = ?)""",
-                (project_id,),
-            )
-            # Delete conversations
-            conn.execute("DELETE FROM conversations WHERE project_id = ?", (project_id,))
-            # Delete project
+        with self._write() as conn:
+            # Conversations, their messages and attachments go with it through ON DELETE CASCADE
             cursor = conn.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
             return cursor.rowcount > 0
 
     # Provider CRUD methods
     def get_default_provider(self) -> Optional[Dict]:
         """Get the default provider with its settings."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             provider = conn.execute("SELECT * FROM providers WHERE is_default = true").fetchone()
-            return dict(provider) if provider else None
+            return provider
 
     def get_all_providers(self) -> List[Dict]:
         """Get all providers."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            providers = conn.execute("SELECT * FROM providers ORDER BY name").fetchall()
-            return [dict(p) for p in providers]
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            providers = conn.execute("SELECT id, name, is_default, host FROM providers ORDER BY name").fetchall()
+            return providers
 
     def get_provider_by_id(self, provider_id: int) -> Optional[Dict]:
         """Get provider by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             provider = conn.execute("SELECT * FROM providers WHERE id = ?", (provider_id,)).fetchone()
-            return dict(provider) if provider else None
+            return provider
 
     def add_provider(self, provider: Dict) -> int:
         """Add a new provider."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute(
                 """INSERT INTO providers
                    (name, temperature, top_p, reasoning_effort, use_for_summarization, host, api_key)
@@ -613,11 +1002,11 @@ class ChatDatabase:
 
     def update_provider(self, provider_id: int, provider: Dict) -> bool:
         """Update provider settings."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute(
                 """UPDATE providers
                    SET name = ?, temperature = ?, top_p = ?, reasoning_effort = ?, use_for_summarization = ?,
-                       host = ?, api_key = ?, updated_at = strftime('%s.%f', 'now')
+                       host = ?, api_key = ?, updated_at = ?
                    WHERE id = ?""",
                 (
                     provider.get("name"),
@@ -627,6 +1016,7 @@ class ChatDatabase:
                     provider.get("use_for_summarization", False),
                     provider.get("host"),
                     provider.get("api_key", ""),
+                    time.time(),
                     provider_id,
                 ),
             )
@@ -634,83 +1024,79 @@ class ChatDatabase:
 
     def delete_provider(self, provider_id: int) -> bool:
         """Delete a provider (cascade deletes models)."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute("DELETE FROM providers WHERE id = ?", (provider_id,))
             return cursor.rowcount > 0
 
     def set_default_provider(self, provider_id: int) -> bool:
         """Set a provider as default."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("UPDATE providers SET is_default = false WHERE is_default = true")
-            cursor = conn.execute("UPDATE providers SET is_default = true WHERE id = ?", (provider_id,))
+        with self._write() as conn:
+            # One pass that only rewrites the rows whose flag flips, and leaves the current default alone
+            # when the target doesn't exist
+            cursor = conn.execute(
+                """UPDATE providers SET is_default = (id = ?1)
+                   WHERE (is_default = true OR id = ?1) AND EXISTS (SELECT 1 FROM providers WHERE id = ?1)""",
+                (provider_id,),
+            )
             return cursor.rowcount > 0
 
     # Model CRUD methods
     def get_models_by_provider(self, provider_id: int) -> List[Dict]:
         """Get all models for a provider."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             models = conn.execute(
-                "SELECT * FROM models WHERE provider_id = ? ORDER BY is_default DESC, model_name", (provider_id,)
+                """SELECT id, provider_id, model_name, is_default, is_multimodal FROM models
+                   WHERE provider_id = ? ORDER BY is_default DESC, model_name""",
+                (provider_id,),
             ).fetchall()
-            return [dict(m) for m in models]
+            return models
 
     def get_default_model(self, provider_id: int) -> Optional[Dict]:
         """Get the default model for a provider."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
             model = conn.execute(
                 "SELECT * FROM models WHERE provider_id = ? AND is_default = true", (provider_id,)
             ).fetchone()
-            return dict(model) if model else None
+            return model
 
     def add_model(
         self, provider_id: int, model_name: str, is_default: bool = False, is_multimodal: bool = False
     ) -> int:
         """Add a model to a provider."""
-        with sqlite3.connect(self.db_path) as conn:
-            # Check if this is the first model for the provider
-            existing_models = conn.execute(
-                "SELECT COUNT(*) FROM models WHERE provider_id = ?", (provider_id,)
-            ).fetchone()[0]
-
-            # If this is the first model, make it default automatically
-            if existing_models == 0:
-                is_default = True
-
+        with self._write() as conn:
             # If setting as default, unset other defaults for this provider
             if is_default:
                 conn.execute(
                     "UPDATE models SET is_default = false WHERE provider_id = ? AND is_default = true", (provider_id,)
                 )
 
+            # The first model of a provider becomes its default automatically, and a duplicate name is
+            # rejected by UNIQUE(provider_id, model_name)
             cursor = conn.execute(
-                "INSERT INTO models (provider_id, model_name, is_default, is_multimodal) VALUES (?, ?, ?, ?)",
-                (provider_id, model_name, is_default, is_multimodal),
+                """INSERT INTO models (provider_id, model_name, is_default, is_multimodal)
+                   VALUES (?, ?, ? OR NOT EXISTS (SELECT 1 FROM models WHERE provider_id = ?), ?)""",
+                (provider_id, model_name, is_default, provider_id, is_multimodal),
             )
             return cursor.lastrowid
 
     def delete_model(self, model_id: int) -> bool:
         """Delete a model."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute("DELETE FROM models WHERE id = ?", (model_id,))
             return cursor.rowcount > 0
 
     def set_default_model(self, model_id: int) -> bool:
         """Set a model as default for its provider."""
-        with sqlite3.connect(self.db_path) as conn:
-            # Get provider_id for this model
-            provider_id = conn.execute("SELECT provider_id FROM models WHERE id = ?", (model_id,)).fetchone()
-            if not provider_id:
-                return False
-
-            # Unset other defaults for this provider
-            conn.execute(
-                "UPDATE models SET is_default = false WHERE provider_id = ? AND is_default = true", (provider_id[0],)
+        with self._write() as conn:
+            # Flip the old and new default of the model's provider in one pass, nothing matches an unknown model
+            cursor = conn.execute(
+                """UPDATE models SET is_default = (id = ?1)
+                   WHERE provider_id = (SELECT provider_id FROM models WHERE id = ?1)
+                     AND (is_default = true OR id = ?1)""",
+                (model_id,),
             )
-
-            # Set this model as default
-            cursor = conn.execute("UPDATE models SET is_default = true WHERE id = ?", (model_id,))
             return cursor.rowcount > 0
 
     def update_conversation_summary(self, conversation_id: str, summary: str):
@@ -720,13 +1106,15 @@ class ChatDatabase:
             conversation_id (str): ID of the conversation
             summary (str): New summary text for the conversation
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """UPDATE conversations
-                   SET summary = ?, updated_at = strftime('%s.%f', 'now')
-                   WHERE conversation_id = ?""",
-                (summary, conversation_id),
-            )
+        with self._write() as conn:
+            self._update_conversation_summary(conn, conversation_id, summary)
+
+    def _update_conversation_summary(self, conn: sqlite3.Connection, conversation_id: str, summary: str):
+        """Update a conversation summary on an existing connection without committing.
+
+        See `update_conversation_summary` for the arguments.
+        """
+        conn.execute(_SQL_UPDATE_SUMMARY, (summary, time.time(), conversation_id))
 
     def add_system_prompt(self, name: str, text: str) -> int:
         """Add a new system prompt.
@@ -738,7 +1126,7 @@ class ChatDatabase:
         Returns:
             int: ID of the newly created prompt
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute("INSERT INTO system_prompts (prompt_name, prompt_text) VALUES (?, ?)", (name, text))
             return cursor.lastrowid
 
@@ -753,14 +1141,14 @@ class ChatDatabase:
         Returns:
             bool: True if successful, False otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute(
                 """UPDATE system_prompts
                    SET prompt_name = ?,
                        prompt_text = ?,
-                       updated_at = strftime('%s.%f', 'now')
+                       updated_at = ?
                    WHERE id = ?""",
-                (name, text, prompt_id),
+                (name, text, time.time(), prompt_id),
             )
             return cursor.rowcount > 0
 
@@ -773,9 +1161,12 @@ class ChatDatabase:
         Returns:
             bool: True if successful, False otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("UPDATE system_prompts SET is_active = false")
-            cursor = conn.execute("UPDATE system_prompts SET is_active = true WHERE id = ?", (prompt_id,))
+        with self._write() as conn:
+            cursor = conn.execute(
+                """UPDATE system_prompts SET is_active = (id = ?1)
+                   WHERE (is_active = true OR id = ?1) AND EXISTS (SELECT 1 FROM system_prompts WHERE id = ?1)""",
+                (prompt_id,),
+            )
             return cursor.rowcount > 0
 
     def get_active_prompt(self) -> Optional[Dict]:
@@ -784,10 +1175,13 @@ class ChatDatabase:
         Returns:
             Optional[Dict]: Active prompt data if found, None otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            prompt = conn.execute("SELECT * FROM system_prompts WHERE is_active = true").fetchone()
-            return dict(prompt) if prompt else None
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            # At most one prompt is active, LIMIT 1 ends the statement on the first index entry
+            prompt = conn.execute(
+                "SELECT id, prompt_name, prompt_text, is_active FROM system_prompts WHERE is_active = true LIMIT 1"
+            ).fetchone()
+            return prompt
 
     def get_all_prompts(self) -> List[Dict]:
         """Get all system prompts.
@@ -795,10 +1189,10 @@ class ChatDatabase:
         Returns:
             List[Dict]: List of all prompts
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            prompts = conn.execute("SELECT * FROM system_prompts").fetchall()
-            return [dict(prompt) for prompt in prompts]
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            prompts = conn.execute("SELECT id, prompt_name, prompt_text, is_active FROM system_prompts").fetchall()
+            return prompts
 
     def get_prompt_by_id(self, prompt_id: int) -> Optional[Dict]:
         """Get a specific system prompt by ID.
@@ -809,10 +1203,28 @@ class ChatDatabase:
         Returns:
             Optional[Dict]: Prompt data if found, None otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            prompt = conn.execute("SELECT * FROM system_prompts WHERE id = ?", (prompt_id,)).fetchone()
-            return dict(prompt) if prompt else None
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            prompt = conn.execute(
+                "SELECT id, prompt_name, prompt_text, is_active FROM system_prompts WHERE id = ?", (prompt_id,)
+            ).fetchone()
+            return prompt
+
+    def get_prompt_by_name(self, name: str) -> Optional[Dict]:
+        """Get a specific system prompt by name.
+
+        Args:
+            name (str): Name of the prompt to retrieve
+
+        Returns:
+            Optional[Dict]: Prompt data if found, None otherwise
+        """
+        with self._read() as conn:
+            conn.row_factory = _dict_factory
+            prompt = conn.execute(
+                "SELECT id, prompt_name, prompt_text, is_active FROM system_prompts WHERE prompt_name = ?", (name,)
+            ).fetchone()
+            return prompt
 
     def delete_system_prompt(self, prompt_id: int) -> bool:
         """Delete a system prompt.
@@ -823,11 +1235,11 @@ class ChatDatabase:
         Returns:
             bool: True if successful, False otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.execute("DELETE FROM system_prompts WHERE id = ? AND prompt_name != 'default'", (prompt_id,))
             return cursor.rowcount > 0
 
-    def edit_message(self, message_id: str, new_content: str) -> bool:
+    def edit_message(self, message_id: str, new_content: str) -> Tuple[bool, Optional[str], Optional[str]]:
         """Edit an existing message's content.
 
         Args:
@@ -835,25 +1247,101 @@ class ChatDatabase:
             new_content (str): New message content
 
         Returns:
-            bool: True if successful, False if message not found
+            Tuple[bool, Optional[str], Optional[str]]: (True, role, conversation_id) if successful,
+                (False, None, None) if message not found
 
         Raises:
             ValueError: If trying to edit a system message
         """
-        with sqlite3.connect(self.db_path) as conn:
-            # Check if message exists and isn't a system message
-            message = conn.execute("SELECT role FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        with self._write() as conn:
+            return self._edit_message(conn, message_id, new_content)
 
-            if not message:
-                return False
+    def _edit_message(
+        self, conn: sqlite3.Connection, message_id: str, new_content: str
+    ) -> Tuple[bool, Optional[str], Optional[str]]:
+        """Edit a message on an existing connection without committing.
 
-            if message[0] == "system":
-                raise ValueError("System messages cannot be edited")
+        See `edit_message` for the arguments.
+        """
+        row = conn.execute(_SQL_EDIT_MESSAGE, (new_content, time.time(), message_id)).fetchone()
+        if row:
+            return True, row[0], row[1]
 
-            cursor = conn.execute(
-                """UPDATE messages
-                   SET content = ?, updated_at = strftime('%s.%f', 'now')
-                   WHERE message_id = ?""",
-                (new_content, message_id),
-            )
-            return cursor.rowcount > 0
+        # Nothing updated: tell a missing message apart from a system message
+        if conn.execute("SELECT 1 FROM messages WHERE message_id = ?", (message_id,)).fetchone():
+            raise ValueError("System messages cannot be edited")
+        return False, None, None
+
+
+class WriteQueue:
+    """Coalesces writes submitted from async code into batched SQLite transactions.
+
+    Writes that arrive within `WRITE_BATCH_WINDOW` of each other are committed together in a
+    single `BEGIN IMMEDIATE ... COMMIT`, with a savepoint per write so one failing write does
+    not roll back the others. A single consumer task submits the batches to the database writer.
+
+    Attributes:
+        db (ChatDatabase): Database the writes are applied to
+    """
+
+    def __init__(self, db: ChatDatabase):
+        self.db = db
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_consumer(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+            self._task = loop.create_task(self._consume())
+
+    async def submit(self, op: str, **kwargs):
+        """Queue a write and wait for it to be committed.
+
+        Args:
+            op (str): Name of the `ChatDatabase` write, e.g. "add_message"
+            **kwargs: Arguments for the write
+
+        Returns:
+            Any: Return value of the write
+        """
+        self._ensure_consumer()
+        future = self._loop.create_future()
+        await self._queue.put((op, kwargs, future))
+        return await future
+
+    async def _consume(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(WRITE_BATCH_WINDOW)
+            while len(batch) < WRITE_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                results = await asyncio.to_thread(self._flush, batch)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _flush(self, batch: List) -> List:
+        results = []
+        with self.db._write() as conn:
+            for op, kwargs, _ in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append(getattr(self.db, f"_{op}")(conn, **kwargs))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append(e)
+        return results
@@ -0,0 +1,27 @@
+from aiaio.db import ChatDatabase
+
+
+def test_add_messages_keeps_import_order(tmp_path):
+    db = ChatDatabase(str(tmp_path / "chat.db"))
+    conversation_id = db.create_conversation()
+    roles = ["system", "user", "assistant", "user", "assistant"]
+    ids = db.add_messages(conversation_id, [{"role": role, "content": f"{role}-{i}"} for i, role in enumerate(roles)])
+
+    history = db.get_conversation_history(conversation_id)
+    assert [m.message_id for m in history] == ids
+    assert [m.message_id for m in db.iter_conversation_history(conversation_id, page_size=2)] == ids
+
+    upto = db.get_conversation_history_upto_message_id(conversation_id, ids[3])
+    assert [m.message_id for m in upto] == ids[:3]
+
+
+def test_history_ties_follow_insertion_order(tmp_path):
+    db = ChatDatabase(str(tmp_path / "chat.db"))
+    conversation_id = db.create_conversation()
+    ids = db.add_messages(
+        conversation_id, [{"role": "user", "content": str(i), "created_at": 100.0} for i in range(5)]
+    )
+
+    assert [m.message_id for m in db.iter_conversation_history(conversation_id, page_size=2)] == ids
+    upto = db.get_conversation_history_upto_message_id(conversation_id, ids[2])
+    assert [m.message_id for m in upto] == ids[:2]